@@ -75,7 +75,17 @@ def generate_moderately_open_maze(
 
 
 def _maze_to_obstacles(m: np.ndarray):
-  """Creates a list of obstacles (walls) from a maze grid."""
+  """Creates the set of obstacles (walls) from a maze grid.
+
+  Each wall at (x, y) is stored as the single integer x * height + y, so a
+  membership test hashes one int rather than a coordinate tuple.
+
+  Args:
+    m: The maze grid, with 1 for walls and 0 for free cells.
+
+  Returns:
+    A frozenset of linearized wall coordinates.
+  """
   height, width = m.shape
   obstacles = (
       [(x, 0) for x in range(width)]
@@ -91,7 +101,7 @@ def _maze_to_obstacles(m: np.ndarray):
       if m[y][x] == 1
   ]
   obstacles.extend(inner_obstacles)
-  return obstacles
+  return frozenset(x * height + y for x, y in obstacles)
 
 
 # Pre-generate a set of mazes.
@@ -105,43 +115,73 @@ for j in range(10):
   the_obstacles = _maze_to_obstacles(a_maze)
   _predefined_mazes.append((a_maze, start, goal, the_obstacles))
 
+# Per-field lookup tables, so the getters below are a single index.
+_obstacle_table = tuple(m[3] for m in _predefined_mazes)
+_start_table = tuple(m[1] for m in _predefined_mazes)
+_goal_table = tuple(m[2] for m in _predefined_mazes)
+_start_x_table = tuple(start[0] for start in _start_table)
+_start_y_table = tuple(start[1] for start in _start_table)
+_goal_x_table = tuple(goal[0] for goal in _goal_table)
+_goal_y_table = tuple(goal[1] for goal in _goal_table)
+_size_table = tuple(m[0].shape[0] for m in _predefined_mazes)
+
+
+def get_maze_size(index: int):
+  """Get the side length of a specific maze, the stride of its obstacles."""
+  return _size_table[index]
+
 
 def get_maze_obstacles(index: int):
-  """Get the obstacles for a specific maze."""
-  _, _, _, obstacles = _predefined_mazes[index]
-  return obstacles
+  """Get the obstacles for a specific maze, keyed as x * size + y."""
+  return _obstacle_table[index]
+
+
+def _is_obstacle(obstacles, x: int, y: int, size: int):
+  """Checks for a wall at (x, y), treating cells off the grid as free.
+
+  The bounds check keeps an off-grid cell from matching the key of a cell
+  inside the grid, e.g. (1, 7) and (2, 0) in a maze of size 7.
+
+  Args:
+    obstacles: The walls, keyed as x * size + y.
+    x: The column of the cell.
+    y: The row of the cell.
+    size: The side length of the maze, e.g. from get_maze_size.
+
+  Returns:
+    Whether the cell is a wall.
+  """
+  return 0 <= x < size and 0 <= y < size and x * size + y in obstacles
 
 
 def get_maze_start_position(index: int):
   """Get the start position for a specific maze."""
-  _, the_start, _, _ = _predefined_mazes[index]
-  return the_start
+  return _start_table[index]
 
 
 def get_maze_goal_position(index: int):
   """Get the goal position for a specific maze."""
-  _, _, the_goal, _ = _predefined_mazes[index]
-  return the_goal
+  return _goal_table[index]
 
 
 def get_maze_start_x(index: int):
   """Get the x-coordinate of the start position for a specific maze."""
-  return get_maze_start_position(index)[0]
+  return _start_x_table[index]
 
 
 def get_maze_start_y(index: int):
   """Get the y-coordinate of the start position for a specific maze."""
-  return get_maze_start_position(index)[1]
+  return _start_y_table[index]
 
 
 def get_maze_goal_position_x(index: int):
   """Get the x-coordinate of the goal position for a specific maze."""
-  return get_maze_goal_position(index)[0]
+  return _goal_x_table[index]
 
 
 def get_maze_goal_position_y(index: int):
   """Get the y-coordinate of the goal position for a specific maze."""
-  return get_maze_goal_position(index)[1]
+  return _goal_y_table[index]
 
 
 # --- Maze Task Functions ---
@@ -272,7 +312,8 @@ def update_current_status(state):
   # Build observation for four cardinal directions.
   x = state.get('mouse_position_x', 0)
   y = state.get('mouse_position_y', 0)
-  obstacles = state.get('world_obstacles', [])
+  obstacles = state.get('world_obstacles', frozenset())
+  size = state.get('world_grid_size', _grid_size)
   cheese = (state.get('mouse_cheese_x'), state.get('mouse_cheese_y'))
   directions = {
       'North': (x, y - 1),
@@ -282,7 +323,7 @@ def update_current_status(state):
   }
   obs_list = []
   for d, (nx, ny) in directions.items():
-    if (nx, ny) in obstacles:
+    if _is_obstacle(obstacles, nx, ny, size):
       cell = 'Wall'
     elif (nx, ny) == cheese:
       cell = 'Cheese'
@@ -317,11 +358,13 @@ def take_action(state):
   # Clip to grid boundaries.
   new_x = max(0, min(grid - 1, new_x))
   new_y = max(0, min(grid - 1, new_y))
-  obstacles = state.get('world_obstacles', [])
+  obstacles = state.get('world_obstacles', frozenset())
   print(obstacles)
   print((new_x, new_y))
   # Check for wall collision.
-  if (new_x, new_y) in obstacles:
+  if _is_obstacle(
+      obstacles, new_x, new_y, state.get('world_grid_size', _grid_size)
+  ):
     state['mouse_hitting_wall_penalty'] = 0.1
     # Do not update position.
   else:
@@ -345,6 +388,7 @@ maze_functions = {
     'take_action': take_action,
     'generate_moderately_open_maze': generate_moderately_open_maze,
     'get_maze_obstacles': get_maze_obstacles,
+    'get_maze_size': get_maze_size,
     'get_maze_start_position': get_maze_start_position,
     'get_maze_goal_position': get_maze_goal_position,
     'get_maze_start_x': get_maze_start_x,
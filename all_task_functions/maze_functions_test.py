@@ -0,0 +1,74 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for maze_functions."""
+
+import ast
+import contextlib
+import io
+import pathlib
+import unittest
+
+from all_task_functions import maze_functions
+from simulation_streams import simulation_utils
+
+
+class ObstacleTest(unittest.TestCase):
+
+  def test_obstacles_match_maze(self):
+    for index in range(10):
+      maze = maze_functions._predefined_mazes[index][0]
+      size = maze_functions.get_maze_size(index)
+      obstacles = maze_functions.get_maze_obstacles(index)
+      for x in range(size):
+        for y in range(size):
+          border = x in (0, size - 1) or y in (0, size - 1)
+          self.assertEqual(
+              maze_functions._is_obstacle(obstacles, x, y, size),
+              border or maze[y][x] == 1,
+              (index, x, y),
+          )
+
+  def test_cells_past_the_boundary_are_free(self):
+    obstacles = maze_functions.get_maze_obstacles(0)
+    size = maze_functions.get_maze_size(0)
+    # (1, size) and (0, size) share their keys with the border walls (2, 0)
+    # and (1, 0)
+    self.assertTrue(maze_functions._is_obstacle(obstacles, 2, 0, size))
+    self.assertTrue(maze_functions._is_obstacle(obstacles, 1, 0, size))
+    self.assertFalse(maze_functions._is_obstacle(obstacles, 1, size, size))
+    self.assertFalse(maze_functions._is_obstacle(obstacles, 0, size, size))
+    self.assertFalse(maze_functions._is_obstacle(obstacles, 1, -1, size))
+    self.assertFalse(maze_functions._is_obstacle(obstacles, -1, 1, size))
+    self.assertFalse(maze_functions._is_obstacle(obstacles, size, 0, size))
+
+  def test_config_grid_size_is_the_key_stride(self):
+    path = pathlib.Path(__file__).parent.parent / 'configs' / 'maze.py'
+    content = path.read_text().replace('{index}', '3')
+    ecs = ast.literal_eval(content[content.find('ecs_config = {') + 13:])
+    with contextlib.redirect_stdout(io.StringIO()):
+      _, state = simulation_utils.generate_operators(
+          ecs['entities'],
+          ecs['variables'],
+          ecs['systems_definitions'],
+          task_name='maze',
+      )
+    self.assertEqual(state['world_grid_size'], maze_functions.get_maze_size(3))
+    self.assertIs(
+        state['world_obstacles'], maze_functions.get_maze_obstacles(3)
+    )
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -504,6 +504,12 @@ if __name__ == '__main__':
       '--model', type=str, default='gemini-1.5-pro', help='LLM model'
   )
   parser.add_argument('--api_key', type=str, default='', help='API key')
+  parser.add_argument(
+      '--lm_cache_dir',
+      type=str,
+      default='',
+      help='Directory to replay and record LLM responses in',
+  )
   parser.add_argument(
       '--output_file', type=str, default='', help='File to save query results'
   )
@@ -515,6 +521,7 @@ if __name__ == '__main__':
   args = parser.parse_args()
   ecs_editor.set_model(args.model)
   ecs_editor.set_api_key(args.api_key)
+  ecs_editor.set_lm_cache_dir(args.lm_cache_dir)
   if args.output_file:
     ecs_editor.output_file_name = args.output_file
 
@@ -28,7 +28,9 @@ ecs_config = {
     'variables': {
         'heading': {
             'time': 0,
-            'grid_size': 7,
+            # The obstacles are keyed as x * grid_size + y, so the wall
+            # checks below take the size from the same maze.
+            'grid_size': 'get_maze_size({index})',
             'obstacles': 'get_maze_obstacles({index})',
         },
         'history_log': {
@@ -116,57 +118,81 @@ ecs_config = {
                     # North
                     "('North (' + str(mouse_position_x) + ',' +"
                     " str(mouse_position_y - 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x, mouse_position_y - 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x,"
+                    ' 0 <= mouse_position_x < world_grid_size and'
+                    ' 0 <= mouse_position_y - 1 < world_grid_size and'
+                    ' mouse_position_x * world_grid_size'
+                    ' + mouse_position_y - 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x,"
                     ' mouse_position_y - 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # South
                     "('South (' + str(mouse_position_x) + ',' +"
                     " str(mouse_position_y + 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x, mouse_position_y + 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x,"
+                    ' 0 <= mouse_position_x < world_grid_size and'
+                    ' 0 <= mouse_position_y + 1 < world_grid_size and'
+                    ' mouse_position_x * world_grid_size'
+                    ' + mouse_position_y + 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x,"
                     ' mouse_position_y + 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # East
                     "('East (' + str(mouse_position_x + 1) + ',' +"
                     " str(mouse_position_y) + '): ' + ('Wall' if"
-                    ' (mouse_position_x + 1, mouse_position_y) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x + 1,"
+                    ' 0 <= mouse_position_x + 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y < world_grid_size and'
+                    ' (mouse_position_x + 1) * world_grid_size'
+                    ' + mouse_position_y in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x + 1,"
                     ' mouse_position_y) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # West
                     "('West (' + str(mouse_position_x - 1) + ',' +"
                     " str(mouse_position_y) + '): ' + ('Wall' if"
-                    ' (mouse_position_x - 1, mouse_position_y) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x - 1,"
+                    ' 0 <= mouse_position_x - 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y < world_grid_size and'
+                    ' (mouse_position_x - 1) * world_grid_size'
+                    ' + mouse_position_y in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x - 1,"
                     ' mouse_position_y) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # Northeast
                     "('Northeast (' + str(mouse_position_x + 1) + ',' +"
                     " str(mouse_position_y - 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x + 1, mouse_position_y - 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x + 1,"
+                    ' 0 <= mouse_position_x + 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y - 1 < world_grid_size and'
+                    ' (mouse_position_x + 1) * world_grid_size'
+                    ' + mouse_position_y - 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x + 1,"
                     ' mouse_position_y - 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # Northwest
                     "('Northwest (' + str(mouse_position_x - 1) + ',' +"
                     " str(mouse_position_y - 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x - 1, mouse_position_y - 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x - 1,"
+                    ' 0 <= mouse_position_x - 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y - 1 < world_grid_size and'
+                    ' (mouse_position_x - 1) * world_grid_size'
+                    ' + mouse_position_y - 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x - 1,"
                     ' mouse_position_y - 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # Southeast
                     "('Southeast (' + str(mouse_position_x + 1) + ',' +"
                     " str(mouse_position_y + 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x + 1, mouse_position_y + 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x + 1,"
+                    ' 0 <= mouse_position_x + 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y + 1 < world_grid_size and'
+                    ' (mouse_position_x + 1) * world_grid_size'
+                    ' + mouse_position_y + 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x + 1,"
                     ' mouse_position_y + 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '. ') + "
                     # Southwest
                     "('Southwest (' + str(mouse_position_x - 1) + ',' +"
                     " str(mouse_position_y + 1) + '): ' + ('Wall' if"
-                    ' (mouse_position_x - 1, mouse_position_y + 1) in'
-                    " world_obstacles else 'Cheese' if (mouse_position_x - 1,"
+                    ' 0 <= mouse_position_x - 1 < world_grid_size and'
+                    ' 0 <= mouse_position_y + 1 < world_grid_size and'
+                    ' (mouse_position_x - 1) * world_grid_size'
+                    ' + mouse_position_y + 1 in world_obstacles'
+                    " else 'Cheese' if (mouse_position_x - 1,"
                     ' mouse_position_y + 1) == (mouse_cheese_x, mouse_cheese_y)'
                     " else 'Empty') + '.')"
                 ),
@@ -267,7 +293,9 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
-                'formula': 'mouse_move_x = max(-1, min(1, mouse_move_x))',
+                'formula': (
+                    'mouse_move_x = (mouse_move_x > 0) - (mouse_move_x < 0)'
+                ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
@@ -289,9 +317,12 @@ ecs_config = {
             },
             {
                 'formula': (
-                    'mouse_hitting_wall_penalty = 0.1 if ((mouse_position_x +'
-                    ' mouse_move_x, mouse_position_y + mouse_move_y) in'
-                    ' world_obstacles) else 0'
+                    'mouse_hitting_wall_penalty = 0.1 if ('
+                    '0 <= mouse_position_x + mouse_move_x < world_grid_size'
+                    ' and 0 <= mouse_position_y + mouse_move_y'
+                    ' < world_grid_size and (mouse_position_x + mouse_move_x)'
+                    ' * world_grid_size + mouse_position_y + mouse_move_y'
+                    ' in world_obstacles) else 0'
                 ),
                 'visibility': 'plan',
                 'for_summary': 'No',
@@ -313,7 +344,9 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
-                'formula': 'mouse_move_y = max(-1, min(1, mouse_move_y))',
+                'formula': (
+                    'mouse_move_y = (mouse_move_y > 0) - (mouse_move_y < 0)'
+                ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
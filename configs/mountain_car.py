@@ -256,6 +256,8 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
+                # The int bounds keep a clamped force an int, so the LM sees
+                # 1 or -1 rather than 1.0, and a fractional force is kept.
                 'formula': 'car_force = max(-1, min(1, car_force))',
                 'visibility': 'x',
                 'for_summary': 'No',
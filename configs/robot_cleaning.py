@@ -31,17 +31,12 @@ ecs_config = {
         'heading': {
             'width': 5,
             'height': 5,
-            'obstacles': [
-                (2, 2),
-                (3, 1),
-            ],
-            'dirty_spots': [
-                (1, 1),
-                (3, 3),
-                (4, 2),
-            ],
-            'cleaned_spots': [
-            ],
+            # Cells are bits of an int mask, cell (x, y) being bit
+            # x * height + y: obstacles at (2, 2) and (3, 1), dirty spots at
+            # (1, 1), (3, 3) and (4, 2).
+            'obstacle_mask': 0x11000,
+            'dirty_mask': 0x440040,
+            'cleaned_mask': 0,
             'time': 0,
         },
         'move': {
@@ -78,31 +73,27 @@ ecs_config = {
         'updates': [
             {
                 'formula': (
-                    'world_cleaned_spots = world_cleaned_spots +'
-                    ' [(robot_position_x, robot_position_y)] if'
-                    ' (robot_position_x, robot_position_y) in world_dirty_spots'
-                    ' else world_cleaned_spots'
+                    'world_cleaned_mask, world_dirty_mask = ('
+                    'world_cleaned_mask | world_dirty_mask & 1 <<'
+                    ' robot_position_x * world_height + robot_position_y,'
+                    ' world_dirty_mask & ~(1 <<'
+                    ' robot_position_x * world_height + robot_position_y))'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
             {
                 'formula': (
-                    'world_dirty_spots = [spot for spot in world_dirty_spots if'
-                    ' spot != (robot_position_x, robot_position_y)]'
+                    "robot_score_cleaning = world_cleaned_mask.bit_count()"
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
-            {
-                'formula': 'robot_score_cleaning = len(world_cleaned_spots)',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
             {
                 'formula': (
-                    'robot_obstacle_penalty = 5 if (robot_position_x,'
-                    ' robot_position_y) in world_obstacles else 0'
+                    'robot_obstacle_penalty = 5 if world_obstacle_mask >>'
+                    ' robot_position_x * world_height + robot_position_y & 1'
+                    ' else 0'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
@@ -134,14 +125,18 @@ ecs_config = {
                 'formula': (
                     "world_room_state = 'Room dimensions: ' + str(world_width)"
                     " + 'x' + str(world_height) +'. Obstacles: ' + ',"
-                    " '.join(['(' + str(x) + ', ' + str(y) + ')' for x, y in"
-                    " world_obstacles]) +'. Dirty spots: ' + ', '.join(['(' +"
-                    " str(x) + ', ' + str(y) + ')' for x, y in"
-                    " world_dirty_spots]) +'. Cleaned spots: ' +"
-                    " str(len(world_cleaned_spots)) + ' spots.'"
+                    " '.join(['(' + str(i // world_height) + ', ' + str(i %"
+                    " world_height) + ')' for i in range(world_width *"
+                    " world_height) if world_obstacle_mask >> i & 1]) +'."
+                    " Dirty spots: ' + ', '.join(['(' + str(i // world_height)"
+                    " + ', ' + str(i % world_height) + ')' for i in"
+                    " range(world_width * world_height) if world_dirty_mask >>"
+                    " i & 1]) +'. Cleaned spots: ' +"
+                    " str(world_cleaned_mask.bit_count()) + ' spots.'"
                 ),
                 'visibility': 'plan',
                 'for_summary': 'No',
+                'memoize': True,
             },
             {
                 'formula': (
@@ -234,26 +229,6 @@ ecs_config = {
                 },
                 'use_lm': 'world_time > 1',
             },
-            {
-                'formula': 'robot_move_x = max(-1, min(1, robot_move_x))',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
-                'formula': 'robot_position_x = robot_position_x + robot_move_x',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
-                'formula': (
-                    'robot_hit_wall = (robot_position_x + robot_move_x !='
-                    ' max(0, min(4, robot_position_x + robot_move_x)) or'
-                    ' robot_position_y + robot_move_y != max(0, min(4,'
-                    ' robot_position_y + robot_move_y)))'
-                ),
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
             {
                 'formula': (
                     "robot_movement_instruction_y = 'Choose the y-direction"
@@ -273,25 +248,27 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
-                'formula': 'robot_move_y = max(-1, min(1, robot_move_y))',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
-                'formula': 'robot_position_y = robot_position_y + robot_move_y',
+                'formula': (
+                    'robot_hit_wall = not (0 <= robot_position_x'
+                    ' + max(-1, min(1, robot_move_x)) < world_width'
+                    ' and 0 <= robot_position_y'
+                    ' + max(-1, min(1, robot_move_y)) < world_height)'
+                ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
             {
                 'formula': (
-                    'robot_position_x = max(0, min(4, robot_position_x))'
+                    'robot_position_x = max(0, min(world_width - 1,'
+                    ' robot_position_x + max(-1, min(1, robot_move_x))))'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
             },
             {
                 'formula': (
-                    'robot_position_y = max(0, min(4, robot_position_y))'
+                    'robot_position_y = max(0, min(world_height - 1,'
+                    ' robot_position_y + max(-1, min(1, robot_move_y))))'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
@@ -310,10 +287,10 @@ ecs_config = {
             },
             {
                 'formula': (
-                    "robot_history = robot_history + 'Time ' + str(world_time)"
-                    " + ': Position: ' + str(round(robot_position_x, 2)) + ', '"
-                    " + str(round(robot_position_y, 2)) + '; Cleaned Spots: ' +"
-                    " str(len(world_cleaned_spots)) + '; '"
+                    "robot_history = robot_history + ('Time ' +"
+                    " str(world_time) + ': Position: ' + str(robot_position_x)"
+                    " + ', ' + str(robot_position_y) + '; Cleaned Spots: ' +"
+                    " str(world_cleaned_mask.bit_count()) + '; ')"
                 ),
                 'visibility': 'hidden',
                 'for_summary': 'Yes',
@@ -321,10 +298,9 @@ ecs_config = {
             {
                 'formula': (
                     "robot_current_status = 'Current Status at Time ' +"
-                    " str(world_time) + ': Position: ' +"
-                    " str(round(robot_position_x, 2)) + ', ' +"
-                    " str(round(robot_position_y, 2)) + '; Cleaned Spots: ' +"
-                    " str(len(world_cleaned_spots)) + '.'"
+                    " str(world_time) + ': Position: ' + str(robot_position_x)"
+                    " + ', ' + str(robot_position_y) + '; Cleaned Spots: ' +"
+                    " str(world_cleaned_mask.bit_count()) + '.'"
                 ),
                 'visibility': 'plan',
                 'for_summary': 'Yes',
@@ -59,11 +59,28 @@ ecs_config = {
     The task proceeds turn by turn, with you acting between each player turn. Add novel, non-generic content to the developing story when called upon, following your rules. Keep the ball in play with throws and catches, but only describe the balls movement when a player has thrown it. Make sure the players always send the ball on promptly to the next person after catching it.
 
     All contributions should be fully in line with the latest development and never lag in time.
+    ''',
+            # Shared by all players, so the action prompt is identical
+            # for Alice, Bob and Charlie.
+            'action_prompt': '''
+    Based on the players latest contribution, determine their action from the following set:
+    - CATCH: The player successfully catches the ball, only possible (valid) if the ball is flying towards them.
+    - THROW_TO_ALICE: The player throws the ball to Alice, only possible (valid) if the ball is with them or flying towards them.
+    - THROW_TO_BOB: The player throws the ball to Bob, only possible (valid) if the ball is with them or flying towards them.
+    - THROW_TO_CHARLIE: The player throws the ball to Charlie, only possible (valid) if the ball is with them or flying towards them.
+    - NO_ACTION: The player does not interact with the ball, this is always allowed.
+
+    Rules for determining the action:
+    1. If the contribution mentions catching or receiving the ball, choose CATCH.
+    2. If the contribution describes throwing or sending the ball to a specific player, choose the appropriate THROW_TO_X action.
+    3. If the contribution does not mention any direct interaction with the ball, choose NO_ACTION.
+    4. Only choose an action that is explicitly described in the contribution.
+
+    Your task is to output ONLY the action name, nothing else. For example: THROW_TO_BOB.
     '''
         },
         'ball1_story': {
             'contribution': 'The ball is with Alice.',
-            'previous_state': '',
             'prompt': '''
     You are the ball in a game of catch between Alice, Bob, and Charlie in a park.
     Your sole responsibility is to provide a simple, factual summary of your current location or movement based EXCLUSIVELY on the MOST RECENT contributions from the world and players, including the most recent player action.
@@ -85,10 +102,51 @@ ecs_config = {
     - Your report must be based SOLELY on information about your last known position or movement from the most recent world or player contributions.
     '''
         },
-        'ball2_story': {},
-        'ball3_story': {},
-        'ball4_story': {},
+        # Ball contribution after each player's action, keyed by the action.
+        'ball2_story': {
+            'transitions': {
+                'CATCH': 'The ball is with Alice.',
+                'THROW_TO_BOB': 'The ball is flying from Alice towards Bob.',
+                'THROW_TO_CHARLIE': (
+                    'The ball is flying from Alice towards Charlie.'
+                ),
+            },
+        },
+        'ball3_story': {
+            'transitions': {
+                'CATCH': 'The ball is with Bob.',
+                'THROW_TO_ALICE': 'The ball is flying from Bob towards Alice.',
+                'THROW_TO_CHARLIE': (
+                    'The ball is flying from Bob towards Charlie.'
+                ),
+            },
+        },
+        'ball4_story': {
+            'transitions': {
+                'CATCH': 'The ball is with Charlie.',
+                'THROW_TO_ALICE': (
+                    'The ball is flying from Charlie towards Alice.'
+                ),
+                'THROW_TO_BOB': 'The ball is flying from Charlie towards Bob.',
+            },
+        },
         'alice_story': {
+            # Actions besides NO_ACTION that are valid for Alice, keyed by the
+            # ball contribution: a throw when holding the ball, and a catch or
+            # a throw when it is flying towards Alice.
+            'valid_actions': {
+                'The ball is with Alice.': {
+                    'THROW_TO_ALICE', 'THROW_TO_BOB', 'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Bob towards Alice.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Charlie towards Alice.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+            },
             'contribution': '',
             'inconsistency_counter': 0,
             'prompt': '''
@@ -121,36 +179,22 @@ ecs_config = {
     8. If the ball is not in your possession, you cannot throw it.
 
     Remember, you can only control your own actions. When you have the ball, you decide who to throw it to, but you cant determine if they catch it. Make sure that your contribution is fully in line with the latest developments (seen in the latest ball contribution and your world view) and never lags in time.
-    ''',
-            'action_prompt': '''
-    Based on the players latest contribution, determine their action from the following set:
-    - CATCH: The player successfully catches the ball, only possible (valid) if the ball is flying towards them.
-    - THROW_TO_ALICE: The player throws the ball to Alice, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_BOB: The player throws the ball to Bob, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_CHARLIE: The player throws the ball to Charlie, only possible (valid) if the ball is with them or flying towards them.
-    - NO_ACTION: The player does not interact with the ball, this is always allowed.
-
-    Rules for determining the action:
-    1. If the contribution mentions catching or receiving the ball, choose CATCH.
-    2. If the contribution describes throwing or sending the ball to a specific player, choose the appropriate THROW_TO_X action.
-    3. If the contribution does not mention any direct interaction with the ball, choose NO_ACTION.
-    4. Only choose an action that is explicitly described in the contribution.
-
-    Your task is to output ONLY the action name, nothing else. For example: THROW_TO_BOB.
     '''
         },
         'alice_world_view': {
             'world_view': '',
+            # Only the last line differs between the players, so that the
+            # three prompts share the rest as a common prefix.
             'world_view_prompt': '''
-    You are describing the world from Alices perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of Bob and Charlie and the current ball position stated in its contribution.
+    You are describing the world from one players perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of the other two players and the current ball position stated in its contribution.
 
     CRITICAL RULES:
-    1. ONLY summarize what has EXPLICITLY been stated in the latest world description and player actions.
-    2. NEVER infer, predict, or move the story forward on your own, , but make sure to not repeat the previous world view but focus on what is new.
+    1. ONLY summarize what has EXPLICITLY been stated in the latest world description and player contributions.
+    2. NEVER infer, predict, or move the story forward on your own, but make sure to not repeat the previous world view but focus on what is new.
     3. Do not add any new information not present in the given descriptions.
-    4. Focus on details that would be most relevant to Alice.
+    4. Focus on details that would be most relevant to that player.
 
-    Guidelines for Alices world view:
+    Guidelines for the world view:
     1. Use 2-3 sentences to describe the current state.
     2. Do not make any assumptions or decisions about future actions.
     3. Only mention objects or events that have been explicitly introduced.
@@ -159,9 +203,27 @@ ecs_config = {
     - You are ONLY summarizing the CURRENT state based on the LATEST information.
     - NEVER influence or predict future actions.
     - Your description must be based SOLELY on EXPLICIT information from the most recent world and player contributions.
+
+    The player is Alice, and the other two players are Bob and Charlie.
     '''
         },
         'bob_story': {
+            # Actions besides NO_ACTION that are valid for Bob, keyed by the
+            # ball contribution: a throw when holding the ball, and a catch or
+            # a throw when it is flying towards Bob.
+            'valid_actions': {
+                'The ball is with Bob.': {
+                    'THROW_TO_ALICE', 'THROW_TO_BOB', 'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Alice towards Bob.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Charlie towards Bob.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+            },
             'contribution': '',
             'inconsistency_counter': 0,
             'prompt': '''
@@ -194,36 +256,20 @@ ecs_config = {
     8. If the ball is not in your possession, you cannot throw it.
 
     Remember, you can only control your own actions. When you have the ball, you decide who to throw it to, but you cant determine if they catch it. Make sure that your contribution is fully in line with the latest developments (seen in the latest ball contribution and your world view) and never lags in time.
-    ''',
-            'action_prompt': '''
-    Based on the players latest contribution, determine their action from the following set:
-    - CATCH: The player successfully catches the ball, only possible (valid) if the ball is flying towards them.
-    - THROW_TO_ALICE: The player throws the ball to Alice, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_BOB: The player throws the ball to Bob, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_CHARLIE: The player throws the ball to Charlie, only possible (valid) if the ball is with them or flying towards them.
-    - NO_ACTION: The player does not interact with the ball, this is always allowed.
-
-    Rules for determining the action:
-    1. If the contribution mentions catching or receiving the ball, choose CATCH.
-    2. If the contribution describes throwing or sending the ball to a specific player, choose the appropriate THROW_TO_X action.
-    3. If the contribution does not mention any direct interaction with the ball, choose NO_ACTION.
-    4. Only choose an action that is explicitly described in the contribution.
-
-    Your task is to output ONLY the action name, nothing else. For example: THROW_TO_BOB.
     '''
         },
         'bob_world_view': {
             'world_view': '',
             'world_view_prompt': '''
-    You are describing the world from Bobs perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of Alice and Charlie and the current ball position stated in its contribution.
+    You are describing the world from one players perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of the other two players and the current ball position stated in its contribution.
 
     CRITICAL RULES:
-    1. ONLY summarize what has EXPLICITLY been stated in the latest world description and player actions.
+    1. ONLY summarize what has EXPLICITLY been stated in the latest world description and player contributions.
     2. NEVER infer, predict, or move the story forward on your own, but make sure to not repeat the previous world view but focus on what is new.
     3. Do not add any new information not present in the given descriptions.
-    4. Focus on details that would be most relevant to Bob.
+    4. Focus on details that would be most relevant to that player.
 
-    Guidelines for Bobs world view:
+    Guidelines for the world view:
     1. Use 2-3 sentences to describe the current state.
     2. Do not make any assumptions or decisions about future actions.
     3. Only mention objects or events that have been explicitly introduced.
@@ -232,9 +278,27 @@ ecs_config = {
     - You are ONLY summarizing the CURRENT state based on the LATEST information.
     - NEVER influence or predict future actions.
     - Your description must be based SOLELY on EXPLICIT information from the most recent world and player contributions.
+
+    The player is Bob, and the other two players are Alice and Charlie.
     '''
         },
         'charlie_story': {
+            # Actions besides NO_ACTION that are valid for Charlie, keyed by the
+            # ball contribution: a throw when holding the ball, and a catch or
+            # a throw when it is flying towards Charlie.
+            'valid_actions': {
+                'The ball is with Charlie.': {
+                    'THROW_TO_ALICE', 'THROW_TO_BOB', 'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Alice towards Charlie.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+                'The ball is flying from Bob towards Charlie.': {
+                    'CATCH', 'THROW_TO_ALICE', 'THROW_TO_BOB',
+                    'THROW_TO_CHARLIE',
+                },
+            },
             'contribution': '',
             'inconsistency_counter': 0,
             'prompt': '''
@@ -267,36 +331,20 @@ ecs_config = {
     8. If the ball is not in your possession, you cannot throw it.
 
     Remember, you can only control your own actions. When you have the ball, you decide who to throw it to, but you cant determine if they catch it. Make sure that your contribution is fully in line with the latest developments (seen in the latest ball contribution and your world view) and never lags in time.
-    ''',
-            'action_prompt': '''
-    Based on the players latest contribution, determine their action from the following set:
-    - CATCH: The player successfully catches the ball, only possible (valid) if the ball is flying towards them.
-    - THROW_TO_ALICE: The player throws the ball to Alice, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_BOB: The player throws the ball to Bob, only possible (valid) if the ball is with them or flying towards them.
-    - THROW_TO_CHARLIE: The player throws the ball to Charlie, only possible (valid) if the ball is with them or flying towards them.
-    - NO_ACTION: The player does not interact with the ball, this is always allowed.
-
-    Rules for determining the action:
-    1. If the contribution mentions catching or receiving the ball, choose CATCH.
-    2. If the contribution describes throwing or sending the ball to a specific player, choose the appropriate THROW_TO_X action.
-    3. If the contribution does not mention any direct interaction with the ball, choose NO_ACTION.
-    4. Only choose an action that is explicitly described in the contribution.
-
-    Your task is to output ONLY the action name, nothing else. For example: THROW_TO_BOB.
     '''
         },
         'charlie_world_view': {
             'world_view': '',
             'world_view_prompt': '''
-    You are describing the world from Charlies perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of Alice and Bob and the current ball position stated in its contribution.
+    You are describing the world from one players perspective in a game of catch. Your role is to provide a simple, factual summary of the current state of the park and the game based EXCLUSIVELY on the MOST RECENT world description, the latest actions of the other two players and the current ball position stated in its contribution.
 
     CRITICAL RULES:
     1. ONLY summarize what has EXPLICITLY been stated in the latest world description and player contributions.
-    2. NEVER infer, predict, or move the story forward on your own, , but make sure to not repeat the previous world view but focus on what is new.
+    2. NEVER infer, predict, or move the story forward on your own, but make sure to not repeat the previous world view but focus on what is new.
     3. Do not add any new information not present in the given descriptions.
-    4. Focus on details that would be most relevant to Charlie.
+    4. Focus on details that would be most relevant to that player.
 
-    Guidelines for Charlies world view:
+    Guidelines for the world view:
     1. Use 2-3 sentences to describe the current state.
     2. Do not make any assumptions or decisions about future actions.
     3. Only mention objects or events that have been explicitly introduced.
@@ -305,6 +353,8 @@ ecs_config = {
     - You are ONLY summarizing the CURRENT state based on the LATEST information.
     - NEVER influence or predict future actions.
     - Your description must be based SOLELY on EXPLICIT information from the most recent world and player contributions.
+
+    The player is Charlie, and the other two players are Alice and Bob.
     '''
         },
         'time': {
@@ -341,57 +391,31 @@ ecs_config = {
                 'world': True,
             },
         ],
-        'ball1_story': [
-            {
-                'formula': 'ball_contribution = ball_contribution',
-                'ball': True,
-            },
-        ],
         'ball2_story': [
-            {'formula': 'ball_previous_state = ball_contribution'},
             {
                 'formula': (
-                    'ball_contribution = ('
-                    '    "The ball is with Alice." if alice_action == "CATCH"'
-                    '    else "The ball is flying from Alice towards Bob."'
-                    '    if alice_action == "THROW_TO_BOB"'
-                    '    else "The ball is flying from Alice towards Charlie."'
-                    '    if alice_action == "THROW_TO_CHARLIE"'
-                    '    else ball_previous_state'
-                    ')'
+                    'ball_contribution = ball2_transitions.get(alice_action,'
+                    ' ball_contribution)'
                 ),
                 'ball': True,
                 'alice': True,
             },
         ],
         'ball3_story': [
-            {
-                'formula': 'ball_previous_state = ball_contribution',
-                'ball': True,
-            },
             {
                 'formula': (
-                    'ball_contribution = (    "The ball is with Bob." if'
-                    ' bob_action == "CATCH" else    "The ball is flying from'
-                    ' Bob towards Alice." if bob_action == "THROW_TO_ALICE"'
-                    ' else    "The ball is flying from Bob towards Charlie." if'
-                    ' bob_action == "THROW_TO_CHARLIE" else   '
-                    ' ball_previous_state)'
+                    'ball_contribution = ball3_transitions.get(bob_action,'
+                    ' ball_contribution)'
                 ),
                 'ball': True,
                 'bob': True,
             },
         ],
         'ball4_story': [
-            {'formula': 'ball_previous_state = ball_contribution'},
             {
                 'formula': (
-                    'ball_contribution = (    "The ball is with Charlie." if'
-                    ' charlie_action == "CATCH" else    "The ball is flying '
-                    'from Charlie towards Alice." if charlie_action == '
-                    '"THROW_TO_ALICE" else    "The ball is flying from Charlie '
-                    'towards Bob." if charlie_action == "THROW_TO_BOB" else '
-                    ' ball_previous_state)'
+                    'ball_contribution = ball4_transitions.get('
+                    'charlie_action, ball_contribution)'
                 ),
                 'ball': True,
                 'charlie': True,
@@ -415,27 +439,29 @@ ecs_config = {
                 'formula': 'alice_action = "THROW_TO_BOB"',
                 'query': {'alice': True},
                 'use_lm': 'world_time > 1',
-                'prompt': 'alice_action_prompt',
+                'prompt': 'world_action_prompt',
+                # The action only depends on the contribution it classifies.
+                'sample_key': 'alice_contribution',
                 'alice': True,
                 'world': True,
                 'ball': True,
             },
             {
                 'formula': (
-                    'action_validity = ('
-                    'alice_action == "NO_ACTION" or '
-                    '(ball_contribution == "The ball is with Alice." and '
-                    'alice_action.startswith("THROW_TO_")) or '
-                    '(ball_contribution.startswith("The ball is flying") and '
-                    'ball_contribution.endswith("Alice.") and '
-                    '(alice_action == "CATCH" or '
-                    'alice_action.startswith("THROW_TO_")))'
-                    ')'
+                    'action_validity = alice_action == "NO_ACTION" or'
+                    ' alice_action in alice_valid_actions.get('
+                    'ball_contribution, ())'
                 ),
                 'query': {'alice': True},
                 'alice': True,
+                # Only an invalid action is revised and checked again.
+                'next': (
+                    "'operator_7_alice_alice_story' if action_validity"
+                    " else 'operator_4_alice_alice_story'"
+                ),
             },
             {
+                'id': 'operator_4_alice_alice_story',
                 'formula': 'alice_contribution = alice_contribution',
                 'query': {'alice': True},
                 'use_lm': 'not action_validity',
@@ -448,37 +474,27 @@ ecs_config = {
                 'formula': 'alice_action = alice_action',
                 'query': {'alice': True},
                 'use_lm': 'not action_validity',
-                'prompt': 'alice_action_prompt',
+                'prompt': 'world_action_prompt',
+                'sample_key': 'alice_contribution',
                 'alice': True,
                 'world': True,
                 'ball': True,
             },
             {
                 'formula': (
-                    'action_validity = ('
-                    'alice_action == "NO_ACTION" or '
-                    '(ball_contribution == "The ball is with Alice." and '
-                    'alice_action.startswith("THROW_TO_")) or '
-                    '(ball_contribution.startswith("The ball is flying") and '
-                    'ball_contribution.endswith("Alice.") and '
-                    '(alice_action == "CATCH" or '
-                    'alice_action.startswith("THROW_TO_")))'
-                    ')'
+                    'action_validity = alice_action == "NO_ACTION" or'
+                    ' alice_action in alice_valid_actions.get('
+                    'ball_contribution, ())'
                 ),
                 'alice': True,
             },
             {
+                'id': 'operator_7_alice_alice_story',
+                # Counts an action that is still invalid and discards it.
                 'formula': (
-                    'alice_inconsistency_counter = alice_inconsistency_counter'
-                    ' + 1 if not action_validity else'
-                    ' alice_inconsistency_counter'
-                ),
-                'alice': True,
-            },
-            {
-                'formula': (
-                    'alice_action = "NO_ACTION" if not action_validity else'
-                    ' alice_action'
+                    'alice_inconsistency_counter, alice_action = ('
+                    'alice_inconsistency_counter + int(not action_validity),'
+                    ' alice_action if action_validity else "NO_ACTION")'
                 ),
                 'alice': True,
             },
@@ -502,26 +518,27 @@ ecs_config = {
                 'formula': 'bob_action = "THROW_TO_CHARLIE"',
                 'query': {'bob': True},
                 'use_lm': 'world_time > 1',
-                'prompt': 'bob_action_prompt',
+                'prompt': 'world_action_prompt',
+                'sample_key': 'bob_contribution',
                 'bob': True,
                 'world': True,
                 'ball': True,
             },
             {
                 'formula': (
-                    'action_validity = ('
-                    'bob_action == "NO_ACTION" or '
-                    '(ball_contribution == "The ball is with Bob." and '
-                    'bob_action.startswith("THROW_TO_")) or '
-                    '(ball_contribution.startswith("The ball is flying") and '
-                    'ball_contribution.endswith("Bob.") and '
-                    '(bob_action == "CATCH" or '
-                    'bob_action.startswith("THROW_TO_")))'
-                    ')'
+                    'action_validity = bob_action == "NO_ACTION" or'
+                    ' bob_action in bob_valid_actions.get('
+                    'ball_contribution, ())'
                 ),
                 'bob': True,
+                # Only an invalid action is revised and checked again.
+                'next': (
+                    "'operator_7_bob_bob_story' if action_validity"
+                    " else 'operator_4_bob_bob_story'"
+                ),
             },
             {
+                'id': 'operator_4_bob_bob_story',
                 'formula': 'bob_contribution = bob_contribution',
                 'query': {'bob': True},
                 'use_lm': 'not action_validity',
@@ -534,36 +551,26 @@ ecs_config = {
                 'formula': 'bob_action = bob_action',
                 'query': {'bob': True},
                 'use_lm': 'not action_validity',
-                'prompt': 'bob_action_prompt',
+                'prompt': 'world_action_prompt',
+                'sample_key': 'bob_contribution',
                 'bob': True,
                 'world': True,
                 'ball': True,
             },
             {
                 'formula': (
-                    'action_validity = ('
-                    'bob_action == "NO_ACTION" or '
-                    '(ball_contribution == "The ball is with Bob." and '
-                    'bob_action.startswith("THROW_TO_")) or '
-                    '(ball_contribution.startswith("The ball is flying") and '
-                    'ball_contribution.endswith("Bob.") and '
-                    '(bob_action == "CATCH" or '
-                    'bob_action.startswith("THROW_TO_")))'
-                    ')'
-                ),
-                'bob': True,
-            },
-            {
-                'formula': (
-                    'bob_inconsistency_counter = bob_inconsistency_counter + 1'
-                    ' if not action_validity else bob_inconsistency_counter'
+                    'action_validity = bob_action == "NO_ACTION" or'
+                    ' bob_action in bob_valid_actions.get('
+                    'ball_contribution, ())'
                 ),
                 'bob': True,
             },
             {
+                'id': 'operator_7_bob_bob_story',
                 'formula': (
-                    'bob_action = "NO_ACTION" if not action_validity else'
-                    ' bob_action'
+                    'bob_inconsistency_counter, bob_action = ('
+                    'bob_inconsistency_counter + int(not action_validity),'
+                    ' bob_action if action_validity else "NO_ACTION")'
                 ),
                 'bob': True,
             },
@@ -586,26 +593,27 @@ ecs_config = {
                 'formula': 'charlie_action = "THROW_TO_BOB"',
                 'query': {'charlie': True},
                 'use_lm': 'world_time > 1',
-                'prompt': 'charlie_action_prompt',
+                'prompt': 'world_action_prompt',
+                'sample_key': 'charlie_contribution',
                 'charlie': True,
                 'world': True,
                 'ball': True,
             },
             {
                 'formula': (
-                    'action_validity = ('
-                    'charlie_action == "NO_ACTION" or '
-                    '(ball_contribution == "The ball is with Charlie." and '
-                    'charlie_action.startswith("THROW_TO_")) or '
-                    '(ball_contribution.startswith("The ball is flying") and '
-                    'ball_contribution.endswith("Charlie.") and '
-                    '(charlie_action == "CATCH" or '
-                    'charlie_action.startswith("THROW_TO_")))'
-                    ')'
+                    'action_validity = charlie_action == "NO_ACTION" or'
+                    ' charlie_action in charlie_valid_actions.get('
+                    'ball_contribution, ())'
                 ),
                 'charlie': True,
+                # Only an invalid action is revised and checked again.
+                'next': (
+                    "'operator_6_charlie_charlie_story' if action_validity"
+                    " else 'operator_4_charlie_charlie_story'"
+                ),
             },
             {
+                'id': 'operator_4_charlie_charlie_story',
                 'formula': 'charlie_contribution = charlie_contribution',
                 'query': {'charlie': True},
                 'use_lm': 'not action_validity',
@@ -618,23 +626,18 @@ ecs_config = {
                 'formula': 'charlie_action = charlie_action',
                 'query': {'charlie': True},
                 'use_lm': 'not action_validity',
-                'prompt': 'charlie_action_prompt',
+                'prompt': 'world_action_prompt',
+                'sample_key': 'charlie_contribution',
                 'charlie': True,
                 'world': True,
                 'ball': True,
             },
             {
+                'id': 'operator_6_charlie_charlie_story',
                 'formula': (
-                    'charlie_inconsistency_counter ='
-                    ' charlie_inconsistency_counter + 1 if not action_validity'
-                    ' else charlie_inconsistency_counter'
-                ),
-                'charlie': True,
-            },
-            {
-                'formula': (
-                    'charlie_action = "NO_ACTION" if not action_validity else'
-                    ' charlie_action'
+                    'charlie_inconsistency_counter, charlie_action = ('
+                    'charlie_inconsistency_counter + int(not action_validity),'
+                    ' charlie_action if action_validity else "NO_ACTION")'
                 ),
                 'charlie': True,
                 'ball': True,
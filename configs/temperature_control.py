@@ -38,7 +38,14 @@ ecs_config = {
         },
         'analysis': {'analysis': ''},
         'planning': {'revision_response': 'No'},
-        'history_log': {'history': 'Start. ', 'message': ''},
+        'history_log': {
+            'history': 'Start. ',
+            # The number of ticks kept in the history, or None to keep all of
+            # them. A number bounds the summary contexts, but the LM then
+            # only sees the last ticks of the history.
+            'history_length': None,
+            'message': '',
+        },
         'adjustment': {'adjustment': 0},
         'messages': {},
     },
@@ -59,7 +66,7 @@ ecs_config = {
                 'experience': True,
             },
             {
-                'formula': 'increment_value = randint(0, 2)-1',
+                'formula': 'increment_value = randint(-1, 1)',
                 'visibility': 'plan',
                 'for_summary': 'No',
             },
@@ -226,11 +233,12 @@ ecs_config = {
             },
             {
                 'formula': (
-                    "control_history = control_history + 'Time ' +"
+                    "control_history = keep_last(control_history + 'Time ' +"
                     " str(world_time) + ': Temperature: ' +"
                     " str(round(world_temperature, 2)) + ', Cooling Power: ' +"
                     " str(round(world_cooling_power, 2)) + '; External Heat: '"
-                    " + str(round(world_external_heat, 2)) + '; '"
+                    " + str(round(world_external_heat, 2)) + '; ', 'Time ',"
+                    ' control_history_length)'
                 ),
                 'visibility': 'hidden',
                 'for_summary': 'Yes',
@@ -43,6 +43,10 @@ ecs_config = {
         'planning': {'revision_response': 'No'},
         'history_log': {
             'history': 'Start. ',
+            # The number of ticks kept in the history, or None to keep all of
+            # them. A number bounds the summary contexts, but the LM then
+            # only sees the last ticks of the history.
+            'history_length': None,
             'message': 'The task has started!',
         },
         'updates': {
@@ -78,12 +82,12 @@ ecs_config = {
                 'for_summary': 'No',
             },
             {
-                'formula': 'world_wind_x = np.random.choice([-1, 0, 1])',
+                'formula': 'world_wind_x = randint(-1, 1)',
                 'visibility': 'plan',
                 'for_summary': 'No',
             },
             {
-                'formula': 'world_wind_y = np.random.choice([-1, 0, 1])',
+                'formula': 'world_wind_y = randint(-1, 1)',
                 'visibility': 'plan',
                 'for_summary': 'No',
             },
@@ -91,7 +95,7 @@ ecs_config = {
         'updates': [
             {
                 'formula': (
-                    'agent_distance_to_target = np.sqrt((agent_position_x -'
+                    'agent_distance_to_target = sqrt((agent_position_x -'
                     ' world_target_x)**2 + (agent_position_y -'
                     ' world_target_y)**2)'
                 ),
@@ -195,21 +199,12 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
-                'formula': 'agent_move_x = max(-1, min(1, agent_move_x))',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
+                # Clamps the move, then moves with the wind and clamps the
+                # position to the grid, in one step
                 'formula': (
-                    'agent_position_x = agent_position_x + agent_move_x +'
-                    ' world_wind_x'
-                ),
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
-                'formula': (
-                    'agent_position_x = max(0, min(4, agent_position_x))'
+                    'agent_move_x, agent_position_x = (max(-1, min(1,'
+                    ' agent_move_x)), max(0, min(4, agent_position_x +'
+                    ' max(-1, min(1, agent_move_x)) + world_wind_x)))'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
@@ -232,21 +227,12 @@ ecs_config = {
                 'use_lm': 'world_time > 1',
             },
             {
-                'formula': 'agent_move_y = max(-1, min(1, agent_move_y))',
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
+                # Clamps the move, then moves with the wind and clamps the
+                # position to the grid, in one step
                 'formula': (
-                    'agent_position_y = agent_position_y + agent_move_y +'
-                    ' world_wind_y'
-                ),
-                'visibility': 'x',
-                'for_summary': 'No',
-            },
-            {
-                'formula': (
-                    'agent_position_y = max(0, min(4, agent_position_y))'
+                    'agent_move_y, agent_position_y = (max(-1, min(1,'
+                    ' agent_move_y)), max(0, min(4, agent_position_y +'
+                    ' max(-1, min(1, agent_move_y)) + world_wind_y)))'
                 ),
                 'visibility': 'x',
                 'for_summary': 'No',
@@ -265,11 +251,12 @@ ecs_config = {
             },
             {
                 'formula': (
-                    "agent_history = agent_history + 'Time ' + str(world_time)"
-                    " + ': Position: ' + str(round(agent_position_x, 2)) + ', '"
-                    " + str(round(agent_position_y, 2)) + '; Distance to"
+                    "agent_history = keep_last(agent_history + 'Time ' +"
+                    " str(world_time) + ': Position: ' +"
+                    " str(round(agent_position_x, 2)) + ', ' +"
+                    " str(round(agent_position_y, 2)) + '; Distance to"
                     " Target: ' + str(round(agent_distance_to_target, 2)) +"
-                    " '; '"
+                    " '; ', 'Time ', agent_history_length)"
                 ),
                 'visibility': 'hidden',
                 'for_summary': 'Yes',
@@ -15,12 +15,17 @@
 """Backend for ECS editor app."""
 
 import ast
+import atexit
 import base64
+import concurrent.futures
+import functools
 import io
 import json
 import os
 import pathlib
+import pprint
 import re
+import time
 from typing import List, Optional
 
 import matplotlib
@@ -30,25 +35,48 @@ from simulation_streams import sampling
 from simulation_streams import simulation_utils
 
 
+set_lm_cache_dir = sampling.set_cache_dir
 sampling = sampling.sampling
 generate_operators = simulation_utils.generate_operators
 query_history = simulation_utils.query_history
+History = simulation_utils.History
 simulation_stream_generator = simulation_utils.simulation_stream_generator
 evaluator = evaluator.evaluator
 
 matplotlib.use('Agg')
 
 
+# The last index get_unique_filename handed out per path, from which the
+# next search starts, so that repeated saves do not probe every earlier file
+_last_file_index = {}
+
+# Escapes for values written into JS string literals, each applied in one
+# pass. Operator data keeps its backslashes and has newlines turned into
+# spaces, as it is HTML rather than a plain value
+_JS_VALUE_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', "'": "\\'"})
+_JS_HTML_ESCAPES = str.maketrans({'"': '\\"', "'": "\\'", '\n': ' '})
+
+# Colored spans used by format_operator_data
+_SPAN_GREEN = "<span style='color: #a6e22e;'>{}</span>"
+_SPAN_YELLOW = "<span style='color: #e6db74;'>{}</span>"
+_SPAN_PURPLE = "<span style='color: #ae81ff;'>{}</span>"
+_SPAN_BLUE = "<span style='color: #66d9ef;'>{}</span>"
+_SPAN_WHITE = "<span style='color: #f8f8f2;'>{}</span>"
+_SPAN_PINK = "<span style='color: #f92672;'>{}</span>"
+_OPERATOR_KEYWORDS = frozenset({'if', 'else', 'for', 'while', 'in', 'append'})
+
+
 def get_unique_filename(base_path):
   """Generate a unique filename."""
   path = pathlib.Path(base_path)
   if not path.exists():
     return path
 
-  file_index = 1
+  file_index = _last_file_index.get(path, 0) + 1
   while True:
     new_path = path.with_name(f'{path.stem}_{file_index}{path.suffix}')
     if not new_path.exists():
+      _last_file_index[path] = file_index
       return new_path
     file_index += 1
 
@@ -70,13 +98,57 @@ def save_results_to_file(the_results, ecs_file, current_time):
   output_path = results_dir / base_filename
   unique_path = get_unique_filename(output_path)
 
-  # Save the results
-  with open(unique_path, 'w') as f:
-    json.dump(the_results, f, indent=2)
+  # Save the results, compactly and through a large buffer, since the
+  # metric histories of long runs grow with every auto-save
+  with open(unique_path, 'w', buffering=1 << 20) as f:
+    json.dump(the_results, f, separators=(',', ':'))
   print(f'Results saved to {unique_path}')
   return unique_path
 
 
+@functools.lru_cache(maxsize=64)
+def _parse_query(query, task_name):
+  """Evaluates a query string such as 'all=True' to keyword arguments, once.
+
+  Args:
+    query: The query, as keyword arguments of dict().
+    task_name: The name of the task to load task functions for.
+
+  Returns:
+    The query as a dictionary, which is shared and must not be modified.
+  """
+  return evaluator(task_name).eval(f'dict({query})')
+
+
+def _save_results_quietly(the_results, ecs_file, current_time):
+  """Saves results like save_results_to_file, printing instead of raising."""
+  try:
+    return save_results_to_file(the_results, ecs_file, current_time)
+  except Exception as e:  # pylint: disable=broad-exception-caught
+    print(f'Failed to save results: {e}')
+
+
+def _report_saved(future):
+  """Reports a background save once its file has been written."""
+  if future.result() is not None:
+    print('********Saved*********')
+
+
+def _format_literal(value):
+  """Formats a configuration as a Python literal that ast.literal_eval reads.
+
+  Keys of any literal type, e.g. tuples, and nested lists round-trip, and
+  the keys keep their order.
+
+  Args:
+    value: The configuration, e.g. a dictionary.
+
+  Returns:
+    The formatted literal.
+  """
+  return pprint.pformat(value, indent=4, width=80, sort_dicts=False)
+
+
 class ECSEditor:
   """Entity-component-system (ECS) editor class."""
 
@@ -95,6 +167,15 @@ class ECSEditor:
     self.current_filename = None  # To store the current filename
     self.last_auto_save_time = 0  # Initialize last auto-save time
     self.auto_save_interval = 10  # Time between auto-saves
+    # Minimum wall-clock seconds between auto-saves, so fast simulations do
+    # not write a file for every interval
+    self.auto_save_debounce = 1.0
+    self.last_auto_save_wall_time = float('-inf')
+    # Writes results in the background, one file after the other. Created
+    # on the first save and shut down by close_saves, also at exit
+    self.save_executor = None
+    self.pending_saves = []  # The futures of the saves not known to be done
+    atexit.register(self.close_saves)
     self.function_sources = {}  # To store function source code
     self.current_system_index = 0  # track the current operator
     self.new_field_name = None
@@ -118,6 +199,9 @@ class ECSEditor:
     self.time_steps = 10  # Default time steps for simulation
     self.current_metric = None  # Track the currently selected metric
     self.metrics = {}  # Store metrics and their values
+    # The values extracted per field and how far the stream was scanned
+    self.extracted_values = {}
+    self.last_gui = None  # The inputs and code of the last GUI refresh
     self.validate_ecs_structure()
     self.initialize_current_selections()
 
@@ -137,6 +221,10 @@ class ECSEditor:
     """Set the api_key to be used."""
     self.api_key = api_key
 
+  def set_lm_cache_dir(self, cache_dir: str):
+    """Set the directory in which LLM responses are replayed and recorded."""
+    set_lm_cache_dir(cache_dir)
+
   def initialize_current_selections(self):
     """Initialize current selections for entities, components, and variables."""
     if self.ecs['entities']:
@@ -209,19 +297,22 @@ class ECSEditor:
       entity = self.last_clicked[1]
       entities = list(self.ecs['entities'].keys())
       index = entities.index(entity)
+      first_moved = index
       if up and index > 0:
         entities[index], entities[index - 1] = (
             entities[index - 1],
             entities[index],
         )
+        first_moved = index - 1
       elif not up and index < len(entities) - 1:
         entities[index], entities[index + 1] = (
             entities[index + 1],
             entities[index],
         )
-      self.ecs['entities'] = {
-          name: self.ecs['entities'][name] for name in entities
-      }
+      # Reordered in place: only the entities from the swap on are
+      # re-inserted, in their new order, at the end of the dictionary
+      for name in entities[first_moved:]:
+        self.ecs['entities'][name] = self.ecs['entities'].pop(name)
       self.last_clicked = ('entity', entities[index])
       self.current_entity = entities[index]
       return self.refresh_gui()
@@ -342,12 +433,17 @@ class ECSEditor:
       if not new_name:
         new_name = f"operator_{len(self.ecs['systems_definitions'][self.current_component]) + 1}"  # pylint: disable=line-too-long
 
-      # Find the current entity for this component
-      entity_name = next((
-          entity
-          for entity, components in self.ecs.get('entities', {}).items()
-          if self.current_component in components
-      ), None)
+      # Find the current entity for this component, which is usually the
+      # selected one, so that the entities are only searched otherwise
+      entities = self.ecs.get('entities', {})
+      if self.current_component in entities.get(self.current_entity, ()):
+        entity_name = self.current_entity
+      else:
+        entity_name = next((
+            entity
+            for entity, components in entities.items()
+            if self.current_component in components
+        ), None)
 
       if entity_name:
         # Create the new ID
@@ -401,26 +497,33 @@ class ECSEditor:
       operators = self.ecs['systems_definitions'][self.current_component]
       index = self.current_operator_index
       if up and index > 0:  # type: ignore
-        (
-            self.ecs['systems_definitions'][self.current_component][index],
-            self.ecs['systems_definitions'][self.current_component][index - 1],
-        ) = (
-            self.ecs['systems_definitions'][self.current_component][index - 1],
-            self.ecs['systems_definitions'][self.current_component][index],
+        operators[index], operators[index - 1] = (
+            operators[index - 1],
+            operators[index],
         )
         self.current_operator_index = index - 1
       elif not up and index < len(operators) - 1:
-        (
-            self.ecs['systems_definitions'][self.current_component][index],
-            self.ecs['systems_definitions'][self.current_component][index + 1],
-        ) = (
-            self.ecs['systems_definitions'][self.current_component][index + 1],
-            self.ecs['systems_definitions'][self.current_component][index],
+        operators[index], operators[index + 1] = (
+            operators[index + 1],
+            operators[index],
         )
         self.current_operator_index = index + 1
       return self.refresh_gui()
     return ''
 
+  def sample(self, prompt, context, default_assignment, value=None,
+             mode='full'):
+    """Samples with self.sampling, using the model and API key set now."""
+    return self.sampling(
+        prompt,
+        context,
+        default_assignment,
+        value,
+        mode,
+        model=self.model,
+        api_key=self.api_key,
+    )
+
   def run_simulation(self, time_steps: Optional[int] = None):
     """Run the simulation for the given number of time steps."""
     if time_steps is None:
@@ -456,28 +559,18 @@ class ECSEditor:
       else:
         first_operator_id = 'operator_world_heading_1'  # Fallback to default
 
-      sampler = (
-          lambda prompt, context, default_assignment, value=None, mode='full': self.sampling(  # pylint: disable=line-too-long
-              prompt,
-              context,
-              default_assignment,
-              value,
-              mode,
-              model=self.model,
-              api_key=self.api_key,
-          )  # pylint: disable=line-too-long
-      )
-
       self.simulation_data = {
           'initial_state': initial_state,
           'operators': operators,
-          'stream': [],
+          # A History, so that re-applying a query after running more
+          # steps only checks the new steps
+          'stream': History(),
           'gen': simulation_stream_generator(
               initial_state,
               operators,
               first_operator_id,
               max_attempts=10,
-              sampling=sampler,
+              sampling=self.sample,
               task_name=self.task_name),
       }
 
@@ -487,30 +580,66 @@ class ECSEditor:
         else time_steps
     )
 
-    while True:
-      try:
-        current_step_data = next(self.simulation_data['gen'])
-        self.simulation_data['stream'].append(current_step_data)
-        # Check if it's time to auto-save metrics
-        current_time = current_step_data['state']['world_time']
-        if current_time - self.last_auto_save_time >= self.auto_save_interval:
-          extracted_values = {
-              metric: self.extract_values(metric)
-              for metric in self.metrics.keys()
-          }
-          ecs_name = self.ecs_name or 'ecs_config'
-          save_results_to_file(extracted_values, ecs_name, current_time)
-          print('********Saved*********')
-          self.last_auto_save_time = current_time
-        if current_time >= end_time:
-          break
-      except StopIteration:
+    # The steps are counted in world_time, which advances once per cycle
+    # through the operators, and the loop also ends with the generator
+    stream_append = self.simulation_data['stream'].append
+    current_time = None
+    for current_step_data in self.simulation_data['gen']:
+      stream_append(current_step_data)
+      # Check if it's time to auto-save metrics
+      current_time = current_step_data['state']['world_time']
+      if (
+          current_time - self.last_auto_save_time >= self.auto_save_interval
+          and time.monotonic() - self.last_auto_save_wall_time
+          >= self.auto_save_debounce
+      ):
+        self.save_in_background(current_time)
+      if current_time >= end_time:
         break
+    # A save skipped by the debounce is made up for with the final values,
+    # and the run only returns once all its saves are written
+    if (
+        current_time is not None
+        and current_time - self.last_auto_save_time >= self.auto_save_interval
+    ):
+      self.save_in_background(current_time)
+    concurrent.futures.wait(self.pending_saves)
+    self.pending_saves = []
     return self.apply_query(self.query_option)
 
+  def save_in_background(self, current_time):
+    """Extracts the metrics now and writes them to a file in the background.
+
+    Args:
+      current_time: The world_time of the values, used in the file name.
+    """
+    extracted_values = {
+        metric: self.extract_values(metric) for metric in self.metrics.keys()
+    }
+    ecs_name = self.ecs_name or 'ecs_config'
+    if self.save_executor is None:
+      self.save_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    future = self.save_executor.submit(
+        _save_results_quietly, extracted_values, ecs_name, current_time
+    )
+    future.add_done_callback(_report_saved)
+    self.pending_saves = [f for f in self.pending_saves if not f.done()]
+    self.pending_saves.append(future)
+    self.last_auto_save_time = current_time
+    self.last_auto_save_wall_time = time.monotonic()
+
+  def close_saves(self):
+    """Waits for the background saves and shuts down their worker."""
+    if self.save_executor is not None:
+      self.save_executor.shutdown(wait=True)
+      self.save_executor = None
+    self.pending_saves = []
+
   def reset_simulation(self):
     """Reset the simulation data."""
+    self.close_saves()
     self.simulation_data = {}
+    self.extracted_values = {}
     return """
       var simOutput = document.getElementById('simulation-output');
       simOutput.innerHTML = '';
@@ -519,8 +648,8 @@ class ECSEditor:
   def apply_query(self, query):
     """Apply a query to the simulation history."""
     try:
-      s = evaluator(self.task_name)  # Initialize the SimpleEval evaluator
-      query_dict = s.eval(f'dict({query})')  # Safely evaluate the query string
+      # Safely evaluate the query string, which is usually one seen before
+      query_dict = _parse_query(query, self.task_name)
       query_result = query_history(
           self.simulation_data['stream'], **query_dict
       )
@@ -556,33 +685,36 @@ class ECSEditor:
 
   def format_simulation_output(self, query_result):
     """Format the simulation output for display."""
-    lines = query_result.split('\n')
     formatted_lines = []
 
-    for line in lines:
+    for line in query_result.split('\n'):
       if '=' in line:
         sampled = ' # sampled' in line
-        line = line.replace(' # sampled', '')
+        if sampled:
+          line = line.replace(' # sampled', '')
 
         lhs, rhs = line.split('=', 1)
         lhs = lhs.strip()
         rhs = rhs.strip()
 
-        lhs_color = '#ff6347' if sampled else '#66d9ef'
-        lhs = f"<span style='color: {lhs_color};'>{lhs}</span>"
-
+        # The colors are set by classes in the page's stylesheet, and the
+        # rest of the line takes the color of the <pre> around it
+        lhs_class = 'sim-sampled' if sampled else 'sim-lhs'
         if rhs.startswith('"') and rhs.endswith('"'):
-          rhs = f"<span style='color: #e6db74;'>{rhs}</span>"
+          rhs_class = 'sim-str'
         elif rhs.startswith("'") and rhs.endswith("'"):
-          rhs = f"<span style='color: #e6db74;'>{rhs}</span>"
+          rhs_class = 'sim-str'
         elif rhs.isdigit():
-          rhs = f"<span style='color: #ae81ff;'>{rhs}</span>"
+          rhs_class = 'sim-num'
         else:
-          rhs = f"<span style='color: #a6e22e;'>{rhs}</span>"
+          rhs_class = 'sim-value'
 
-        formatted_line = f"{lhs} <span style='color: #f8f8f2;'>=</span> {rhs}"
+        formatted_line = (
+            f'<span class={lhs_class}>{lhs}</span> ='
+            f' <span class={rhs_class}>{rhs}</span>'
+        )
       else:
-        formatted_line = f"<span style='color: #f8f8f2;'>{line}</span>"
+        formatted_line = line
 
       formatted_lines.append(formatted_line)
 
@@ -605,35 +737,9 @@ class ECSEditor:
           'systems_definitions': self.ecs['systems_definitions'],
       }
 
-      def dict_to_str(d, indent: int = 0):
-        """Convert dictionary to a string with proper formatting."""
-        result = []
-        ind = ' ' * indent
-        for key, value in d.items():
-          if isinstance(value, dict):
-            result.append(f"{ind}'{key}': " + '{')
-            result.append(dict_to_str(value, indent + 4))
-            result.append(f'{ind}' + '},')
-          elif isinstance(value, list):
-            result.append(f"{ind}'{key}': [")
-            for item in value:
-              if isinstance(item, dict):
-                result.append(ind + '    {')
-                result.append(dict_to_str(item, indent + 8))
-                result.append(ind + '    },')
-              else:
-                result.append(f'{ind}    {repr(item)},')
-            result.append(ind + '],')
-          else:
-            result.append(f"{ind}'{key}': {repr(value)},")
-        return '\n'.join(result)
-
-      config_str = dict_to_str(ecs_dict, 4)
       with open(py_file, 'w') as f:
         f.write('# Generated Python file from ECS configuration\n\n')
-        f.write('ecs_config = {\n')
-        f.write(config_str)
-        f.write('\n}\n')
+        f.write(f'ecs_config = {_format_literal(ecs_dict)}\n')
       print(f'Saved ECS configuration to {py_file}')
       return self.create_download_link(py_file)
     except Exception as e:  # pylint: disable=broad-exception-caught
@@ -643,9 +749,10 @@ class ECSEditor:
   def assign_default_op_ids(self):
     """Assign default op_ids to operators without one, ensuring uniqueness."""
     used_op_ids = set()
+    systems_definitions = self.ecs['systems_definitions']
     for entity, components in self.ecs.get('entities', {}).items():
       for component in components:
-        operators = self.ecs['systems_definitions'].get(component, [])
+        operators = systems_definitions.get(component, [])
         for i, operator in enumerate(operators):
           if 'id' not in operator:
             # Generate default op_id in the format name_entity_component
@@ -695,16 +802,20 @@ class ECSEditor:
 
   def replace_index_in_variables(self, index: int):
     """Replace {index} in callable expressions within variables."""
-    for variable_name, variable_data in self.ecs['variables'].items():
+    index_str = str(index)
+    for variable_data in self.ecs['variables'].values():
       for key, value in variable_data.items():
-        if isinstance(value, str) and self.is_callable_expression(value):
-          self.ecs['variables'][variable_name][key] = value.replace(
-              '{index}', str(index))
+        if (
+            isinstance(value, str)
+            and '{index}' in value
+            and self.is_callable_expression(value)
+        ):
+          # Replacing the value of an existing key does not resize the dict
+          variable_data[key] = value.replace('{index}', index_str)
 
   def is_callable_expression(self, value):
     """Check if a string looks like a callable expression."""
-    return isinstance(value, str) and re.match(
-        r'^[a-zA-Z_][a-zA-Z0-9_]*\s*\(.*\)$', value.strip())
+    return simulation_utils.is_callable_expression(value)
 
   def create_download_link(self, file_name):
     """Create a download link for the saved file."""
@@ -736,35 +847,11 @@ class ECSEditor:
       }
       try:
         py_file = f'{component_name}.py'
-        def dict_to_str(d, indent=0):
-          """Convert dictionary to a string with proper formatting."""
-          result = []
-          ind = ' ' * indent
-          for key, value in d.items():
-            if isinstance(value, dict):
-              result.append(f"{ind}'{key}': " + '{')
-              result.append(dict_to_str(value, indent + 4))
-              result.append(f'{ind}' + '},')
-            elif isinstance(value, list):
-              result.append(f"{ind}'{key}': [")
-              for item in value:
-                if isinstance(item, dict):
-                  result.append(ind + '    {')
-                  result.append(dict_to_str(item, indent + 8))
-                  result.append(ind + '    },')
-                else:
-                  result.append(f'{ind}    {repr(item)},')
-              result.append(ind + '],')
-            else:
-              result.append(f"{ind}'{key}': {repr(value)},")
-          return '\n'.join(result)
-
-        config_str = dict_to_str(component_data, 4)
         with open(py_file, 'w') as f:
           f.write('# Generated Python file from Component configuration\n\n')
-          f.write(f'{component_name}_config = {{\n')
-          f.write(config_str)
-          f.write('\n}\n')
+          f.write(
+              f'{component_name}_config = {_format_literal(component_data)}\n'
+          )
         print(f'Saved Component configuration to {py_file}')
         return self.create_download_link(py_file)
       except Exception as e:  # pylint: disable=broad-exception-caught
@@ -855,9 +942,6 @@ class ECSEditor:
       ].get(self.current_variable, '')
     else:
       current_variable_field_value = ''
-    current_variable_field_value = self.format_variable_value(
-        current_variable_field_value
-    )
     current_operator_field_key = (
         self.current_operator_field if self.current_operator_field else ''
     )
@@ -870,10 +954,6 @@ class ECSEditor:
         else ''
     )
 
-    formatted_operator_field_value = self.format_operator_data(
-        current_operator_field_value
-    )
-
     if (
         self.current_operator_index is not None
         and 'id' in operators[self.current_operator_index]
@@ -887,74 +967,66 @@ class ECSEditor:
         [op['id'] for op in operators if 'id' in op] if operators else []
     )
 
+    # Selection handlers often refresh an unchanged view, so the code is
+    # reused when everything it shows is equal. Containers are compared by
+    # their repr, since they can be edited in place after being cached.
+    def snapshot(value):
+      return value if isinstance(value, (str, int, float)) else repr(value)
+
+    gui_key = (
+        entities,
+        list(components),
+        variable_fields,
+        operator_names,
+        operator_fields,
+        metrics,
+        current_entity_value,
+        current_component_value,
+        current_variable_field_key,
+        snapshot(current_variable_field_value),
+        current_operator_field_key,
+        snapshot(current_operator_field_value),
+        trimmed_operator_name,
+    )
+    if self.last_gui is not None and self.last_gui[0] == gui_key:
+      return self.last_gui[1]
+
+    current_variable_field_value = self.format_variable_value(
+        current_variable_field_value
+    )
+    formatted_operator_field_value = self.format_operator_data(
+        current_operator_field_value
+    )
+    # The lists are written as JSON, as repr is not valid JS once a name
+    # contains a quote
+    entities = json.dumps(entities, ensure_ascii=False)
+    components = json.dumps(list(components), ensure_ascii=False)
+    variable_fields = json.dumps(variable_fields, ensure_ascii=False)
+    operator_names = json.dumps(operator_names, ensure_ascii=False)
+    operator_fields = json.dumps(operator_fields, ensure_ascii=False)
+    metrics = json.dumps(metrics, ensure_ascii=False)
+
     js_code = f"""
-      var entityList = document.getElementById('entity-list');
-      entityList.innerHTML = '';
-      var entities = {entities};
-      entities.forEach(function(entity) {{
-        var option = document.createElement('option');
-        option.value = entity;
-        option.text = entity;
-        entityList.appendChild(option);
-      }});
+      setOptions('entity-list', {entities});
       document.getElementById('entity-name-input').value = "{current_entity_value}";
 
-      var componentList = document.getElementById('component-list');
-      componentList.innerHTML = '';
-      var components = {components};
-      components.forEach(function(component) {{
-        var option = document.createElement('option');
-        option.value = component;
-        option.text = component;
-        componentList.appendChild(option);
-      }});
+      setOptions('component-list', {components});
       document.getElementById('component-name-input').value = "{current_component_value}";
 
-      var variableFieldList = document.getElementById('variable-field-list');
-      variableFieldList.innerHTML = '';
-      var variableFields = {variable_fields};
-      variableFields.forEach(function(field) {{
-        var option = document.createElement('option');
-        option.value = field;
-        option.text = field;
-        variableFieldList.appendChild(option);
-      }});
+      setOptions('variable-field-list', {variable_fields});
       document.getElementById('variable-field-key-input').value = "{current_variable_field_key}";
       document.getElementById('variable-field-value-input').value = "{current_variable_field_value}";
 
-      var operatorList = document.getElementById('operator-list');
-      operatorList.innerHTML = '';
-      var operators = {operator_names};
-      operators.forEach(function(operator) {{
-        var option = document.createElement('option');
-        option.value = operator;
-        option.text = operator;
-        operatorList.appendChild(option);
-      }});
+      setOptions('operator-list', {operator_names});
       document.getElementById('operator-name-input').value = "{trimmed_operator_name}";
 
-      var operatorFieldList = document.getElementById('operator-field-list');
-      operatorFieldList.innerHTML = '';
-      var operatorFields = {operator_fields};
-      operatorFields.forEach(function(field) {{
-        var option = document.createElement('option');
-        option.value = field;
-        option.text = field;
-        operatorFieldList.appendChild(option);
-      }});
+      setOptions('operator-field-list', {operator_fields});
       document.getElementById('operator-field-key-input').value = "{current_operator_field_key}";
       document.getElementById('operator-field-value-input').innerHTML = "{formatted_operator_field_value}";
 
-      var metricList = document.getElementById('metric-list');
-      metricList.innerHTML = '';
-      var metrics = {metrics};
-      metrics.forEach(function(metric) {{
-        var option = document.createElement('option');
-        option.value = metric;
-        option.text = metric;
-        metricList.appendChild(option);
-      }});
+      setOptions('metric-list', {metrics});
       """
+    self.last_gui = (gui_key, js_code)
     return js_code
 
   def format_variable_value(self, value):
@@ -967,11 +1039,7 @@ class ECSEditor:
     value = ' '.join(filter(None, lines))
 
     # Escape quotes and backslashes for JavaScript
-    value = value.replace('\\', '\\\\')
-    value = value.replace('"', '\\"')
-    value = value.replace("'", "\\'")
-
-    return value
+    return value.translate(_JS_VALUE_ESCAPES)
 
   def format_operator_data(self, value):
     """Format the operator data for display."""
@@ -986,10 +1054,7 @@ class ECSEditor:
       """Escape string for JavaScript without losing HTML formatting."""
       if not isinstance(text, str):
         return text
-      text = text.replace('"', '\\"')
-      text = text.replace("'", "\\'")
-      text = text.replace('\n', ' ')
-      return text
+      return text.translate(_JS_HTML_ESCAPES)
 
     # First clean up any multiline strings
     value = clean_multiline(value)
@@ -999,60 +1064,54 @@ class ECSEditor:
           value.strip().startswith('lambda')
           or value.strip().startswith('def ')
       ):
-        formatted_line = f"<span style='color: #a6e22e;'>{value}</span>"
+        formatted_line = _SPAN_GREEN.format(value)
       elif '=' in value:
         lhs, rhs = value.split('=', 1)
         lhs = lhs.strip()
         rhs = rhs.strip()
 
-        lhs = f"<span style='color: #a6e22e;'>{lhs}</span>"
+        lhs = _SPAN_GREEN.format(lhs)
 
         if rhs.startswith('"') or rhs.startswith("'"):
-          rhs = f"<span style='color: #e6db74;'>{rhs}</span>"
+          rhs = _SPAN_YELLOW.format(rhs)
         elif rhs.isdigit():
-          rhs = f"<span style='color: #ae81ff;'>{rhs}</span>"
+          rhs = _SPAN_PURPLE.format(rhs)
         else:
-          rhs = f"<span style='color: #a6e22e;'>{rhs}</span>"
+          rhs = _SPAN_GREEN.format(rhs)
 
-        formatted_line = f"{lhs} <span style='color: #f8f8f2;'>=</span> {rhs}"
+        formatted_line = f"{lhs} {_SPAN_WHITE.format('=')} {rhs}"
       else:
-        keywords = ['if', 'else', 'for', 'while', 'in', 'append']
-        words = value.split()
         formatted_words = []
-        for word in words:
-          if word in keywords:
-            formatted_words.append(
-                f"<span style='color: #f92672;'>{word}</span>")
+        for word in value.split():
+          if word in _OPERATOR_KEYWORDS:
+            formatted_words.append(_SPAN_PINK.format(word))
           else:
-            formatted_words.append(
-                f"<span style='color: #a6e22e;'>{word}</span>")
+            formatted_words.append(_SPAN_GREEN.format(word))
         formatted_line = ' '.join(formatted_words)
     elif isinstance(value, dict):
       formatted_lines = []
       for k, v in value.items():
-        formatted_key = f"<span style='color: #66d9ef;'>{k}</span>"
+        formatted_key = _SPAN_BLUE.format(k)
         if isinstance(v, str):
           if v.startswith('"') or v.startswith("'"):
-            formatted_value = f"<span style='color: #e6db74;'>{v}</span>"
+            formatted_value = _SPAN_YELLOW.format(v)
           else:
-            formatted_value = f"<span style='color: #e6db74;'>'{v}'</span>"
+            formatted_value = _SPAN_YELLOW.format(f"'{v}'")
         elif isinstance(v, bool):
-          formatted_value = f"<span style='color: #ae81ff;'>{v}</span>"
+          formatted_value = _SPAN_PURPLE.format(v)
         elif isinstance(v, (int, float)):
-          formatted_value = f"<span style='color: #a6e22e;'>{v}</span>"
+          formatted_value = _SPAN_GREEN.format(v)
         else:
-          formatted_value = f"<span style='color: #f8f8f2;'>{v}</span>"
+          formatted_value = _SPAN_WHITE.format(v)
 
         formatted_line = (
-            f"{formatted_key}<span style='color: #f8f8f2;'>:</span> "
-            f"{formatted_value}")
+            f"{formatted_key}{_SPAN_WHITE.format(':')} {formatted_value}")
         formatted_lines.append(formatted_line)
 
-      formatted_line = (
-          "<span style='color: #f8f8f2;'>{" + ', '.join(formatted_lines) +
-          '}</span>')
+      formatted_line = _SPAN_WHITE.format(
+          '{' + ', '.join(formatted_lines) + '}')
     else:
-      formatted_line = f"<span style='color: #f8f8f2;'>{value}</span>"
+      formatted_line = _SPAN_WHITE.format(value)
 
     # Finally, escape the formatted HTML for JavaScript
     return escape_for_js(formatted_line)
@@ -1288,9 +1347,16 @@ class ECSEditor:
       # If there's no stream, return an empty list
       return values
 
+    stream = self.simulation_data['stream']
     previous_time = None
-
-    for step in self.simulation_data['stream']:
+    scanned = 0
+    # The stream is only appended to, so only the steps added since the
+    # last extraction of the field are scanned
+    cached = self.extracted_values.get(field)
+    if cached is not None and cached[0] is stream:
+      _, scanned, previous_time, values = cached
+
+    for step in stream[scanned:]:
       current_time = step['state'].get('world_time', None)
       if current_time != previous_time:
         value = step['state'].get(field, None)
@@ -1298,7 +1364,8 @@ class ECSEditor:
           values.append(value)
         previous_time = current_time
 
-    return values
+    self.extracted_values[field] = (stream, len(stream), previous_time, values)
+    return list(values)
 
   def rename_operator(self, new_name):
     """Rename the selected operator and update its ID."""
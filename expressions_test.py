@@ -0,0 +1,207 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for expressions."""
+
+import collections
+import unittest
+from unittest import mock
+
+from simulation_streams import evaluator as expressions
+
+
+_STATE = {
+    'x': 3,
+    'y': -2,
+    'f': 2.5,
+    'flag': True,
+    'name': 'NO_ACTION',
+    'mask': 0x440040,
+    'cells': frozenset({1, 8, 15}),
+    'pair': (1, 2),
+    'table': {'a': ('THROW_TO_BOB',)},
+    'history': 'Time 1: a; Time 2: b; Time 3: c; ',
+}
+_PARITY_EXPRESSIONS = (
+    'x + y * 2 - f / 2',
+    'x // 2 + x % 2 + -y',
+    'x ** 2 + f ** 0.5',
+    'mask >> x * 5 + 2 & 1',
+    'mask & ~(1 << 6) | 1 << x',
+    'mask.bit_count()',
+    '0 <= x < 5 and 0 <= y < 5',
+    'x * 7 + 1 in cells',
+    '(x, y) == pair or not flag',
+    "1 if name.startswith('THROW_TO_') else 0 if flag else -1",
+    "name in table.get('a', ())",
+    "'Time ' + str(x) + ': ' + name.lower() + '; '",
+    'max(-1, min(1, y)) + abs(y) + round(f) + int(f) + float(x)',
+    'sqrt(x * x + y * y) + ceil(f) + floor(f)',
+    "keep_last(history, 'Time ', 2)",
+)
+
+
+class KeepLastTest(unittest.TestCase):
+
+  def test_keeps_the_last_entries(self):
+    history = 'Start. Time 1: a; Time 2: b; Time 3: c; '
+    self.assertEqual(
+        expressions.keep_last(history, 'Time ', 2), 'Time 2: b; Time 3: c; '
+    )
+    self.assertEqual(
+        expressions.keep_last(history, 'Time ', 3),
+        'Time 1: a; Time 2: b; Time 3: c; ',
+    )
+
+  def test_keeps_the_whole_text_with_fewer_entries(self):
+    history = 'Start. Time 1: a; Time 2: b; '
+    self.assertEqual(expressions.keep_last(history, 'Time ', 3), history)
+    self.assertEqual(expressions.keep_last(history, 'Time ', 64), history)
+
+  def test_keeps_the_whole_text_without_the_marker(self):
+    self.assertEqual(expressions.keep_last('Start. ', 'Time ', 2), 'Start. ')
+    self.assertEqual(expressions.keep_last('', 'Time ', 2), '')
+
+  def test_keeps_the_whole_text_without_a_count(self):
+    history = 'Start. Time 1: a; Time 2: b; '
+    self.assertEqual(expressions.keep_last(history, 'Time ', None), history)
+
+
+class NativeParityTest(unittest.TestCase):
+
+  def _eval(self, expression, state):
+    s = expressions.evaluator('')
+    s.names = state
+    return s.eval(expression)
+
+  def test_same_value_as_simpleeval(self):
+    for expression in _PARITY_EXPRESSIONS:
+      native = expressions.compile_native(expression)
+      self.assertIsNotNone(native, expression)
+      expected = self._eval(expression, _STATE)
+      value = native(_STATE)
+      self.assertEqual(value, expected, expression)
+      self.assertIs(type(value), type(expected), expression)
+
+  def test_guarded_operators_raise_as_in_simpleeval(self):
+    for expression, state in (
+        ('x ** y', {'x': 2, 'y': 5000000}),
+        ('s * n', {'s': 'a', 'n': 1000000}),
+        ('n * s', {'s': 'a', 'n': 1000000}),
+        ('x << y', {'x': 1, 'y': 100000}),
+        ('x >> y', {'x': 1, 'y': 100000}),
+    ):
+      native = expressions.compile_native(expression)
+      self.assertIsNotNone(native, expression)
+      with self.assertRaises(Exception) as expected:
+        self._eval(expression, state)
+      with self.assertRaises(type(expected.exception)):
+        native(state)
+
+  def test_rejects_expressions_outside_the_subset(self):
+    for expression in (
+        '[x for x in cells][0]',
+        'np.sqrt(x)',
+        '_private + 1',
+        'name.replace("A", "B")',
+        'sorted(cells)',
+        'lambda: x',
+        'x = 1',
+    ):
+      self.assertIsNone(expressions.compile_native(expression), expression)
+
+  def test_missing_name(self):
+    native = expressions.compile_native('x + missing')
+    with self.assertRaises(NameError):
+      native({'x': 1})
+
+
+class NativeMemoTest(unittest.TestCase):
+
+  def test_reuses_the_result_for_equal_immutable_inputs(self):
+    native = expressions.compile_native('a + b')
+    first = native({'a': 'x' * 10, 'b': 'y' * 10})
+    # Equal inputs in another state return the very same result object
+    self.assertIs(native({'a': 'x' * 10, 'b': 'y' * 10}), first)
+    self.assertEqual(native({'a': 'x', 'b': 'y'}), 'xy')
+
+  def test_distinguishes_equal_values_of_other_types(self):
+    native = expressions.compile_native('x * 2')
+    self.assertIs(type(native({'x': 1})), int)
+    self.assertIs(type(native({'x': 1.0})), float)
+    self.assertIs(type(native({'x': True})), int)
+
+  def test_does_not_reuse_results_for_mutable_inputs(self):
+    native = expressions.compile_native("d.get('k', 0) + 1")
+    d = {'k': 1}
+    self.assertEqual(native({'d': d}), 2)
+    d['k'] = 5
+    self.assertEqual(native({'d': d}), 6)
+
+    native = expressions.compile_native("'k' in items")
+    items = ['j']
+    self.assertFalse(native({'items': items}))
+    items.append('k')
+    self.assertTrue(native({'items': items}))
+
+  def test_does_not_reuse_results_for_the_state(self):
+    native = expressions.compile_native("state.get('a', 0) + 1")
+    state = {'a': 1}
+    state['state'] = state
+    self.assertEqual(native(state), 2)
+    state['a'] = 5
+    self.assertEqual(native(state), 6)
+
+
+class MemoizedEvalTest(unittest.TestCase):
+
+  def _eval(self, expression, state, memo):
+    s = expressions.evaluator('')
+    s.names = state
+    return expressions.memoized_eval(s, expression, memo)
+
+  def test_same_value_as_eval(self):
+    memo = collections.OrderedDict()
+    for x in (1, 2, 1, 2.0):
+      for cells in ({1, 2}, [2, 1], {3}):
+        state = {'x': x, 'cells': cells}
+        value = self._eval('sorted(cells) + [x * 2]', state, memo)
+        self.assertEqual(value, sorted(cells) + [x * 2])
+        self.assertIs(type(value[-1]), type(x))
+
+  def test_reuses_the_result_for_equal_inputs(self):
+    memo = collections.OrderedDict()
+    first = self._eval('str(sorted(cells))', {'cells': {1, 2}}, memo)
+    self.assertIs(self._eval('str(sorted(cells))', {'cells': {2, 1}}, memo),
+                  first)
+    self.assertEqual(len(memo), 1)
+
+  def test_evicts_the_least_recently_used(self):
+    memo = collections.OrderedDict()
+    with mock.patch.object(expressions, '_MEMO_SIZE', 2):
+      for x in (1, 2, 1, 3):
+        self.assertEqual(self._eval('x + 1', {'x': x}, memo), x + 1)
+    self.assertEqual([key[1] for key in memo], [(int, 1), (int, 3)])
+
+  def test_does_not_cache_the_state_or_unhashable_values(self):
+    memo = collections.OrderedDict()
+    state = {'state': {'x': 1}}
+    self.assertEqual(self._eval("state.get('x')", state, memo), 1)
+    value = {'a': [bytearray(b'x')]}
+    self.assertIs(self._eval('x', {'x': value}, memo), value)
+    self.assertEqual(len(memo), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
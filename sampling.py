@@ -13,9 +13,12 @@
 # limitations under the License.
 """Provides a sampling function to generate text from an LLM."""
 
+import hashlib
 import json
+import os
 import re
 import subprocess
+import tempfile
 import time
 
 MODEL_PROVIDER_MAPPING = {
@@ -191,6 +194,50 @@ def run_model_command(prompt: str, model: str, api_key: str) -> str:
   return extracted_text
 
 
+# Directory from which sample_text replays responses and to which sampling
+# records those it could parse, if set
+_cache_dir = ''
+
+
+def set_cache_dir(cache_dir: str):
+  """Replays LLM responses from, and records new ones to, a directory.
+
+  Responses are keyed by the SHA-256 of the model and the prompt, so
+  re-running a simulation replays identical calls from disk instead of
+  calling the model again. Only responses that sampling parsed into an
+  assignment are recorded, so a malformed one is asked for again.
+
+  Args:
+    cache_dir: The directory, or '' to always call the model.
+  """
+  global _cache_dir  # pylint: disable=global-statement
+  _cache_dir = cache_dir
+
+
+def _cache_path(prompt, model):
+  """Returns the cache file for a model call, or None without a cache."""
+  if not _cache_dir:
+    return None
+  key = hashlib.sha256(f'{model}\0{prompt}'.encode()).hexdigest()
+  return os.path.join(_cache_dir, key[:2], key)
+
+
+def _record(prompt, model, text):
+  """Records a response in the cache, unless it is already there."""
+  cache_path = _cache_path(prompt, model)
+  if not cache_path or os.path.exists(cache_path):
+    return
+  directory = os.path.dirname(cache_path)
+  os.makedirs(directory, exist_ok=True)
+  # Written to a file of its own and renamed, so concurrent writers do not
+  # share a temporary file and a cache file is never read half-done
+  with tempfile.NamedTemporaryFile(
+      'w', encoding='utf-8', dir=directory, suffix='.tmp', delete=False
+  ) as f:
+    f.write(text)
+  os.replace(f.name, cache_path)
+
+
 def sample_text(
     prompt,
     model='',
@@ -203,21 +250,27 @@ def sample_text(
   """Sample text from the LLM, with multiple attempts."""
   attempts = 0
   text = ''
-  while attempts < max_attempts:
-    try:
-      text = run_model_command(prompt, model, api_key)
-      break  # If successful, break out of the loop
-    except Exception as e:  # pylint: disable=broad-exception-caught
-      attempts += 1
-      if attempts == max_attempts:
-        raise RuntimeError(
-            f'Failed to sample text after {max_attempts} attempts: {e}'
-        ) from e
-      print(
-          f'Attempt {attempts} failed: {e}. Retrying after {wait_time} '
-          'seconds...'
-      )
-      time.sleep(wait_time)  # Wait before the next attempt
+  cache_path = _cache_path(prompt, model)
+  if cache_path and os.path.exists(cache_path):
+    # Replayed, so the model is not called
+    with open(cache_path, encoding='utf-8') as f:
+      text = f.read()
+  else:
+    while attempts < max_attempts:
+      try:
+        text = run_model_command(prompt, model, api_key)
+        break  # If successful, break out of the loop
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        attempts += 1
+        if attempts == max_attempts:
+          raise RuntimeError(
+              f'Failed to sample text after {max_attempts} attempts: {e}'
+          ) from e
+        print(
+            f'Attempt {attempts} failed: {e}. Retrying after {wait_time} '
+            'seconds...'
+        )
+        time.sleep(wait_time)  # Wait before the next attempt
 
   if len(text) > max_characters:
     text = text[:max_characters]
@@ -308,7 +361,14 @@ def sampling(
       ' format, but only write a python line when you have chosen your'
       ' continuation.'
   )
-  query = prompt + hint + '\n\n' + context
+  if mode == 'full':
+    # The hint, which holds the current value, goes last, so that the
+    # static prompt followed by the append-only context is a stable prefix
+    # across calls that the provider's prompt caching can reuse.
+    query = prompt + '\n\n' + context + hint
+  else:
+    # The context ends with the assignment being completed
+    query = prompt + hint + '\n\n' + context
   query = clean_context(query)
   text = sample_text(query, model, api_key)
   print(text)
@@ -338,8 +398,11 @@ def sampling(
       if line.strip().startswith(default_assignment):
         r = line.strip()
         print(r)
+        _record(query, model, text)
         return r
     return ''
 
   # Reduced mode
+  if first_line.strip():
+    _record(query, model, text)
   return first_line.strip()
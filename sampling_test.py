@@ -0,0 +1,99 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sampling."""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from simulation_streams import sampling
+
+
+class CacheTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    cache_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(cache_dir.cleanup)
+    self.cache_dir = cache_dir.name
+    sampling.set_cache_dir(self.cache_dir)
+    self.addCleanup(sampling.set_cache_dir, '')
+
+  def _sample(self, responses, mode='full'):
+    """Samples with a fake model, returning the result and the prompts."""
+    prompts = []
+
+    def run_model_command(prompt, model, api_key):
+      del model, api_key  # Unused
+      prompts.append(prompt)
+      return responses.pop(0)
+
+    with mock.patch.object(sampling, 'run_model_command', run_model_command):
+      with contextlib.redirect_stdout(io.StringIO()):
+        result = sampling.sampling(
+            'Prompt', 'x = 1', 'x', 1, mode=mode, model='fake'
+        )
+    return result, prompts
+
+  def _files(self):
+    return sorted(
+        name
+        for _, _, names in os.walk(self.cache_dir)
+        for name in names
+    )
+
+  def test_replays_a_recorded_response(self):
+    result, prompts = self._sample(['Thinking.\nx = 2'])
+    self.assertEqual(result, 'x = 2')
+    self.assertEqual(len(prompts), 1)
+    self.assertEqual(len(self._files()), 1)
+
+    result, prompts = self._sample([])
+    self.assertEqual(result, 'x = 2')
+    self.assertEqual(prompts, [])
+
+  def test_replays_a_recorded_right_hand_side(self):
+    self.assertEqual(self._sample(['3'], mode='rhs_only')[0], '3')
+    self.assertEqual(self._sample([], mode='rhs_only'), ('3', []))
+
+  def test_does_not_record_a_response_that_did_not_parse(self):
+    result, _ = self._sample(['I would rather not.'])
+    self.assertEqual(result, '')
+    self.assertEqual(self._files(), [])
+
+    result, prompts = self._sample(['x = 4'])
+    self.assertEqual(result, 'x = 4')
+    self.assertEqual(len(prompts), 1)
+
+  def test_leaves_no_temporary_files(self):
+    self._sample(['x = 2'])
+    files = self._files()
+    self.assertEqual(len(files), 1)
+    self.assertFalse(files[0].endswith('.tmp'), files)
+
+  def test_calls_the_model_without_a_cache_dir(self):
+    sampling.set_cache_dir('')
+    self._sample(['x = 2'])
+    result, prompts = self._sample(['x = 3'])
+    self.assertEqual(result, 'x = 3')
+    self.assertEqual(len(prompts), 1)
+    self.assertEqual(self._files(), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,13 +14,25 @@
 
 """Simulator and Entity-Component-System (ECS) utilities."""
 
+import ast
+import collections
 import copy
+import dataclasses
+import functools
+import random
 import re
+import sys
+import textwrap
+import types
+from typing import Any, Callable, Mapping, Optional
 
 import numpy as np
 from simulation_streams import evaluator
 
 
+compile_predicate = evaluator.compile_predicate
+compile_native = evaluator.compile_native
+memoized_eval = evaluator.memoized_eval
 evaluator = evaluator.evaluator
 
 
@@ -66,6 +78,104 @@ def read_context(history, query, current_state):
   return truncated_context
 
 
+_NO_VALUE = object()
+
+
+def _step_matches(step, kwargs):
+  """Checks whether a history step's state satisfies a query."""
+  return all(
+      step['state'].get(k) == v
+      if not isinstance(v, list)
+      else step['state'].get(k) in v
+      for k, v in kwargs.items()
+  )
+
+
+def _query_checks(kwargs):
+  """Splits a query into the checks _step_matches does, once.
+
+  Args:
+    kwargs: The query, e.g. {'alice': True, 'visibility': ['plan', 'x']}.
+
+  Returns:
+    A tuple of (key, value, values) triples, where values is the set of
+    allowed values for a list value of hashable items and None otherwise.
+  """
+  checks = []
+  for k, v in kwargs.items():
+    values = None
+    if isinstance(v, list):
+      try:
+        values = frozenset(v)
+      except TypeError:
+        pass
+    checks.append((k, v, values))
+  return tuple(checks)
+
+
+def _passes_checks(state, checks):
+  """Checks whether a state satisfies the checks from _query_checks."""
+  for k, v, values in checks:
+    value = state.get(k)
+    if values is not None:
+      try:
+        if value not in values:
+          return False
+        continue
+      except TypeError:  # An unhashable value, checked against the list
+        pass
+    if isinstance(v, list):
+      if value not in v:
+        return False
+    elif value != v:
+      return False
+  return True
+
+
+class History(list):
+  """A simulation history that remembers the steps matching each query.
+
+  Steps are only ever appended, so for a query seen before only the steps
+  added since the last time it was asked need to be checked.
+  """
+
+  def __init__(self, *args):
+    super().__init__(*args)
+    self._matches = {}
+    # Sampled formulas of operators with a 'sample_key', see run_formula
+    self.samples = {}
+    # Results of operators with 'memoize', see evaluator.memoized_eval
+    self.memo = collections.OrderedDict()
+
+  def query(self, **kwargs):
+    """Returns the outputs of the steps that satisfy the query.
+
+    Args:
+      **kwargs: The query, e.g. visibility='plan'.
+
+    Returns:
+      A list with the output lines of all matching steps, in order.
+    """
+    try:
+      key = tuple(sorted(
+          (k, tuple(v) if isinstance(v, list) else v)
+          for k, v in kwargs.items()
+      ))
+      hash(key)
+    except TypeError:
+      key = None
+    if key in self._matches:
+      results, scanned, checks = self._matches[key]
+    else:
+      results, scanned, checks = [], 0, _query_checks(kwargs)
+    for step in self[scanned:]:
+      if _passes_checks(step['state'], checks):
+        results.extend(step['output'])
+    if key is not None:
+      self._matches[key] = (results, len(self), checks)
+    return results
+
+
 def query_history(history, **kwargs):
   """Quering history for a sub-stream satisfying the kwargs.
 
@@ -77,23 +187,59 @@ def query_history(history, **kwargs):
     A string with the relevant sub-stream.
 
   """
-  results = []
-  for step in history:
-    match = all(
-        step['state'].get(k) == v
-        if not isinstance(v, list)
-        else step['state'].get(k) in v
-        for k, v in kwargs.items()
-    )
-    if match:
-      results.extend(step['output'])
+  if isinstance(history, History):
+    results = history.query(**kwargs)
+  else:
+    results = []
+    for step in history:
+      if _step_matches(step, kwargs):
+        results.extend(step['output'])
   context = '\n'.join(results)
   return context.rstrip('\n') + '\n'
 
 
+@functools.lru_cache(maxsize=4096)
+def split_assignment(formula):
+  """Splits an assignment formula into its target and expression, once.
+
+  Args:
+    formula: The formula, e.g. 'a, b = f(x)' or "d['k'] = 1".
+
+  Returns:
+    A tuple (lhs, rhs, keys, names) with the stripped left- and right-hand
+    sides, the dictionary keys of a subscript target such as d['k'] (empty
+    otherwise) and the variable names of a plain or tuple target.
+  """
+  lhs, rhs = formula.split('=', 1)
+  lhs = lhs.strip()
+  rhs = rhs.strip()
+  keys = ()
+  names = ()
+  if "['" in lhs:
+    keys = tuple(re.findall(r"\['(.*?)'\]", lhs))
+  else:
+    # Tuple target, e.g. 'a, b = f(x)', sets several variables at once
+    names = tuple(name.strip() for name in lhs.split(','))
+  return lhs, rhs, keys, names
+
+
 def run_formula(state, formula_data, max_attempts, sampling, history,
-                task_name=''):
-  """Runs a given formula to update the state."""
+                task_name='', use_lm=None):
+  """Runs a given formula to update the state.
+
+  Args:
+    state: The state, updated in place.
+    formula_data: The operator's data, with its 'formula'.
+    max_attempts: The number of attempts at sampling a compliant formula.
+    sampling: The sampling function used.
+    history: The history of the stream so far.
+    task_name: The name of the task to load task functions for.
+    use_lm: Whether to sample the formula, if already decided for this step,
+      or None to decide from formula_data['use_lm'].
+
+  Returns:
+    The state and the output lines of the step.
+  """
   formula = formula_data['formula']
   state['state'] = state
   output = []
@@ -105,6 +251,12 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
     prompt = state['prompt']
 
   use_lm_setting = formula_data.get('use_lm', False)
+  if use_lm is not None:
+    use_lm_setting = bool(use_lm)
+  if state.get('lm_mode') == 'deterministic':
+    # Every formula is evaluated as written, e.g. 'x = x' keeps x, so the
+    # simulation runs without calling the LM
+    use_lm_setting = False
   if isinstance(use_lm_setting, str):
     try:
       s = evaluator(task_name)
@@ -135,9 +287,20 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
     rhs_default = formula.split('=', 1)[1].strip() if '=' in formula else None
     if rhs_default is not None:
       try:
-        s = evaluator(task_name)
-        s.names = state
-        default_value = s.eval(rhs_default)
+        default_value = _NO_VALUE
+        if formula_data.get('lm_only') and rhs_default in state:
+          default_value = state[rhs_default]
+        elif formula_data.get('fn') is not None:
+          # E.g. a constant seed contribution, handed out without parsing
+          try:
+            default_value = formula_data['fn'](state)
+          except Exception:  # pylint: disable=broad-exception-caught
+            # Evaluated again below, which reports the error as usual
+            pass
+        if default_value is _NO_VALUE:
+          s = evaluator(task_name)
+          s.names = state
+          default_value = s.eval(rhs_default)
         if isinstance(default_value, (int, float)):
           expected_type = 'number'
         elif isinstance(default_value, bool):
@@ -159,6 +322,22 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
         else ''
     )
 
+    # An operator with a 'sample_key' reuses what was sampled for the same
+    # assignment, prompt and key value, e.g. the action classified from an
+    # unchanged contribution, instead of calling the LM again.
+    sample_key = None
+    if formula_data.get('sample_key') and isinstance(history, History):
+      try:
+        s = evaluator(task_name)
+        s.names = state
+        sample_key = (
+            default_assignment, prompt, s.eval(formula_data['sample_key'])
+        )
+        hash(sample_key)
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f'Failed to evaluate sample_key expression: {e}')
+        sample_key = None
+
     while attempts < max_attempts:
       print('attempt' + str(attempts) + ' of ' + str(max_attempts))
       sample_mode = state.get('sample_mode', 'full')
@@ -175,7 +354,13 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
             ' special setting used here.'
         )
 
-      if sample_mode == 'full':
+      if (
+          attempts == 0
+          and sample_key is not None
+          and sample_key in history.samples
+      ):
+        sampled_formula = history.samples[sample_key]
+      elif sample_mode == 'full':
         sampled_formula = sampling(
             prompt,
             context,
@@ -211,6 +396,8 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
 
           if is_number or is_bool or is_str or is_tuple or is_list or is_dict:
             state[default_assignment] = value
+            if sample_key is not None:
+              history.samples[sample_key] = sampled_formula
             if isinstance(value, (str, tuple, list, dict)):
               output_value = f'{default_assignment} = {repr(value)}'
             else:
@@ -248,22 +435,39 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
   else:
     if formula != 'blank':
       try:
-        lhs, rhs = formula.split('=', 1)
-        lhs = lhs.strip()
-        rhs = rhs.strip()
+        lhs, rhs, keys, names = split_assignment(formula)
 
-        s = evaluator(task_name)
-        s.names = state
-        value = s.eval(rhs)
+        value = _NO_VALUE
+        if formula_data.get('lm_only') and rhs in state:
+          value = state[rhs]
+        elif formula_data.get('fn') is not None:
+          try:
+            value = formula_data['fn'](state)
+          except Exception:  # pylint: disable=broad-exception-caught
+            # Evaluated again below, which reports the error as usual
+            pass
+        if value is _NO_VALUE:
+          s = evaluator(task_name)
+          s.names = state
+          if formula_data.get('memoize') and isinstance(history, History):
+            value = memoized_eval(s, rhs, history.memo)
+          else:
+            value = s.eval(rhs)
 
-        if "['" in lhs:
-          keys = re.findall(r"\['(.*?)'\]", lhs)
+        if keys:
           current_dict = state
           for key in keys[:-1]:
             if key not in current_dict:
               current_dict[key] = {}
             current_dict = current_dict[key]
           current_dict[keys[-1]] = value
+        elif len(names) > 1:
+          if len(names) != len(value):
+            raise ValueError(
+                f'Expected {len(names)} values to unpack, got {len(value)}'
+            )
+          for name, item in zip(names, value):
+            state[name] = item
         else:
           state[lhs] = value
 
@@ -289,14 +493,262 @@ def run_formula(state, formula_data, max_attempts, sampling, history,
   return state, output
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class Operator:
+  """An operator frozen after generation, with its fields split up front.
+
+  Attributes:
+    id: The operator id.
+    formula: The formula the operator runs.
+    next: The id of the next operator, or a conditional expression for it.
+    data: A read-only view of the full operator definition.
+    properties: The fields that are copied into the state at every step.
+    next_fn: For a conditional next, a function of the state returning the
+      id of the next operator, else None.
+    step: For a native formula, a function running it without the LM on the
+      state and returning the output lines, else None.
+  """
+
+  id: str
+  formula: str
+  next: str
+  data: Mapping[str, Any]
+  properties: Mapping[str, Any]
+  next_fn: Optional[Callable[[Mapping[str, Any]], str]] = None
+  step: Optional[Callable[[dict[str, Any]], list[str]]] = None
+
+
+def _constant_function(expression):
+  """Returns a function giving the value of a constant expression, or None.
+
+  Only immutable literals, e.g. instruction strings, numbers or tuples of
+  them, qualify, so that the single value can be handed out every step.
+  Strings are interned, so that equal instructions share one object.
+
+  Args:
+    expression: The right-hand side of a formula.
+
+  Returns:
+    A function of the state returning the constant, or None.
+  """
+  try:
+    value = ast.literal_eval(expression.strip())
+  except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+    return None
+
+  def is_immutable(item):
+    if isinstance(item, tuple):
+      return all(is_immutable(element) for element in item)
+    return item is None or isinstance(item, (str, int, float, bool))
+
+  if not is_immutable(value):
+    return None
+  if isinstance(value, str):
+    # The same instructions are assigned by several operators and configs,
+    # which then all hand out a single copy
+    value = sys.intern(value)
+  return lambda state: value
+
+
+def _next_function(expression, task_name=''):
+  """Compiles a conditional next expression to a function of the state.
+
+  Args:
+    expression: The expression, e.g. "'a' if action_validity else 'b'".
+    task_name: The name of the task to load task functions for.
+
+  Returns:
+    A function of the state returning the id of the next operator.
+  """
+  expression = expression.strip()
+  fn = compile_native(expression)
+  if fn is None:
+    s = evaluator(task_name)
+
+    def fn(state):
+      s.names = state
+      return s.eval(expression)
+
+  return fn
+
+
+def _step_function(formula, fn):
+  """Specializes run_formula to a native formula when the LM is not used.
+
+  The assignment target is split once, here, so that a step only evaluates
+  fn and stores the value, and an identity such as 'x = x' is not evaluated
+  at all. A failing step raises before changing the state, and the caller
+  runs the formula again through run_formula, which reports the error as
+  usual.
+
+  Args:
+    formula: The formula, e.g. 'world_time = world_time + 1'.
+    fn: The native function of the state giving its right-hand side.
+
+  Returns:
+    A function running the formula on the state and returning its output
+    lines, or None for a dictionary target such as d['k'].
+  """
+  lhs, rhs, keys, names = split_assignment(formula)
+  if keys:
+    return None
+
+  def output(value):
+    if isinstance(value, str):
+      return [f'{lhs} = "{value}"']
+    return [f'{lhs} = {value}']
+
+  if names == (rhs,):
+    # An identity such as 'x = x', which only lets the LM sample x, so
+    # without the LM it just outputs the current value
+    def step(state):
+      return output(state[rhs])
+
+  elif len(names) == 1:
+    name = names[0]
+
+    def step(state):
+      value = fn(state)
+      state[name] = value
+      return output(value)
+
+  else:
+
+    def step(state):
+      value = fn(state)
+      if len(names) != len(value):
+        raise ValueError(
+            f'Expected {len(names)} values to unpack, got {len(value)}'
+        )
+      for name, item in zip(names, value):
+        state[name] = item
+      return output(value)
+
+  return step
+
+
+def _intern_strings(value, max_length=32):
+  """Interns the short strings in a (nested) operator or variable value.
+
+  Values such as 'plan' or 'Yes' are copied into every state snapshot and
+  compared in history queries, where interned strings compare by identity.
+
+  Args:
+    value: The value, e.g. an operator dictionary or an initial value.
+    max_length: Strings up to this length are interned.
+
+  Returns:
+    A copy of dicts and lists with their short strings interned.
+  """
+  if isinstance(value, str):
+    return sys.intern(value) if len(value) <= max_length else value
+  if isinstance(value, dict):
+    return {
+        _intern_strings(k, max_length): _intern_strings(v, max_length)
+        for k, v in value.items()
+    }
+  if isinstance(value, list):
+    return [_intern_strings(item, max_length) for item in value]
+  return value
+
+
+def freeze_operators(operators, task_name=''):
+  """Freezes generated operators into a read-only mapping indexed by id.
+
+  A 'use_lm' given as an expression string is parsed here, once, and stored
+  in the operator data as a callable so that it is not re-parsed every step,
+  and so is a conditional 'next'.
+  Likewise, the right-hand side of a purely arithmetic formula is compiled
+  to a native 'fn' of the state, which is tried before the evaluator, and
+  the whole formula to a native 'step' for when the LM is not used.
+
+  Args:
+      operators: The list of operator dictionaries.
+      task_name: The name of the task to load task functions for.
+
+  Returns:
+      A read-only mapping from operator id to Operator. If ids collide, the
+      first operator with that id is kept.
+  """
+  frozen = {}
+  for operator in operators:
+    if operator['id'] in frozen:
+      continue
+    operator = _intern_strings(operator)
+    properties = {
+        key: value
+        for key, value in operator.items()
+        if key not in ['id', 'formula', 'next']
+    }
+    data = dict(operator)
+    # Formulas like 'x = x' only exist to let the LM sample x, so there is
+    # nothing to evaluate when the LM is not used.
+    data['lm_only'] = bool(
+        re.fullmatch(r'\s*(\w+)\s*=\s*\1\s*', operator['formula'])
+    )
+    # Constant and pure arithmetic formulas run as native Python, unless a
+    # 'fn' is given
+    if data.get('fn') is None and '=' in operator['formula']:
+      rhs = operator['formula'].split('=', 1)[1]
+      data['fn'] = _constant_function(rhs) or compile_native(rhs)
+    if isinstance(data.get('use_lm'), str):
+      data['use_lm'] = compile_predicate(
+          data['use_lm'], task_name, label='use_lm expression'
+      )
+    frozen[operator['id']] = Operator(
+        id=operator['id'],
+        formula=operator['formula'],
+        next=operator['next'],
+        data=types.MappingProxyType(data),
+        properties=types.MappingProxyType(properties),
+        next_fn=(
+            _next_function(operator['next'], task_name)
+            if ' if ' in f' {operator["next"]} '
+            else None
+        ),
+        step=(
+            _step_function(operator['formula'], data['fn'])
+            if data.get('fn') is not None
+            else None
+        ),
+    )
+  return types.MappingProxyType(frozen)
+
+
+def spawn_state(initial_state):
+  """Creates a fresh state for a new stream from an initial state.
+
+  Only containers such as dicts, lists and sets are deep-copied, so that
+  streams never share mutable values; everything else is shared.
+
+  Args:
+      initial_state: The initial values, e.g. from generate_operators.
+
+  Returns:
+      A new state dictionary.
+  """
+  state = {}
+  for key, value in initial_state.items():
+    if key == 'state':
+      value = state  # Keep the state a member of itself
+    elif isinstance(value, (dict, list, set)):
+      value = copy.deepcopy(value)
+    state[key] = value
+  return state
+
+
 def simulation_stream_generator(
     initial_state, operators, first_operator, max_attempts=3, sampling=None,
     task_name=''):
   """Generates a sequence of states by applying operators from a given list.
 
+  Several streams can share one set of operators: pass the result of
+  freeze_operators as operators and only the initial state is copied.
+
   Args:
       initial_state: The initial values
-      operators: The list of operators that transforms the state
+      operators: The list of operators that transforms the state, or a
+        mapping from freeze_operators.
       first_operator: The operator to start with
       max_attempts: The number of attempts to reach a compliant sample .
       sampling: The sampling function used.
@@ -305,27 +757,44 @@ def simulation_stream_generator(
   Yields:
       New states
   """
-  state = initial_state.copy()
+  state = spawn_state(initial_state)
   state['np'] = np  # If you need numpy
   state['sampling'] = sampling
 
-  history = []  # Maintain the running history within this generator
+  history = History()  # Maintain the running history within this generator
 
+  if isinstance(operators, types.MappingProxyType):
+    operators_by_id = operators
+  else:
+    operators_by_id = freeze_operators(operators, task_name)
   current_operator_id = first_operator  # Start with the first formula
 
   while True:
-    formula_data = next(
-        item for item in operators if item['id'] == current_operator_id
-    )
-
-    # Update state with formula data's properties
-    for key, value in formula_data.items():
-      if key not in ['id', 'formula', 'next']:
-        state[key] = value
-
-    state, output = run_formula(
-        state, formula_data, max_attempts, sampling, history, task_name
-    )
+    operator = operators_by_id[current_operator_id]
+
+    # Update state with the operator's properties
+    state.update(operator.properties)
+
+    output = None
+    use_lm = None  # Decided by run_formula, unless decided here
+    if operator.step is not None:
+      # Decided once, so that e.g. a random use_lm expression is not drawn
+      # again by run_formula
+      use_lm = operator.data.get('use_lm') is True
+      if state.get('lm_mode') == 'deterministic':
+        use_lm = False
+      elif callable(operator.data.get('use_lm')):
+        use_lm = operator.data['use_lm'](state)
+      if not use_lm:
+        try:
+          output = operator.step(state)
+        except Exception:  # pylint: disable=broad-exception-caught
+          pass  # Run again below, which reports the error as usual
+    if output is None:
+      state, output = run_formula(
+          state, operator.data, max_attempts, sampling, history, task_name,
+          use_lm,
+      )
 
     # Append to the history and then yield the current step's data
     current_step_data = {
@@ -337,15 +806,12 @@ def simulation_stream_generator(
 
     yield current_step_data
 
-    if ' if ' in f' {formula_data["next"]} ':
-      # Contains a proper if statement with spaces
-      expression = formula_data['next'].strip()
-      s = evaluator()
-      s.names = state
-      current_operator_id = s.eval(expression)
+    if operator.next_fn is not None:
+      # A proper if statement with spaces, compiled by freeze_operators
+      current_operator_id = operator.next_fn(state)
     else:
       # No conditional logic, use the string value directly
-      current_operator_id = formula_data['next']
+      current_operator_id = operator.next
 
 
 def generate_simulation_stream(
@@ -354,7 +820,8 @@ def generate_simulation_stream(
     first_operator,
     max_attempts=3,
     sampling=None,
-    end_time=25,):
+    end_time=25,
+    task_name='',):
   """Runs the simulation_stream_generator.
 
   Args:
@@ -364,13 +831,14 @@ def generate_simulation_stream(
       max_attempts: The number of attempts at sampling a compliant formula.
       sampling: The sampling function used.
       end_time: The `world_time` value at which the simulation should end.
+      task_name: The name of the task to load task functions for.
 
   Returns:
       A list of states generated by the simulation.
   """
-  initial_state = copy.deepcopy(initial_state)
   gen = simulation_stream_generator(
-      initial_state, operators, first_operator, max_attempts, sampling
+      initial_state, operators, first_operator, max_attempts, sampling,
+      task_name,
   )
 
   stream = []
@@ -384,6 +852,59 @@ def generate_simulation_stream(
   return stream
 
 
+def generate_simulation_streams(
+    initial_state,
+    operators,
+    first_operator,
+    seeds,
+    max_attempts=3,
+    sampling=None,
+    end_time=25,
+    task_name='',
+):
+  """Runs one stream per random seed, e.g. for a sweep over the seeds.
+
+  The operators are frozen once and shared by all streams, each of which
+  starts from its own copy of the initial state. Set 'lm_mode' to
+  'deterministic' in the initial state to roll out without the LM.
+
+  Args:
+      initial_state: The initial values.
+      operators: The operators that transform the state, or a mapping from
+        freeze_operators.
+      first_operator: The operator to start with.
+      seeds: The seeds of the random numbers, one per stream.
+      max_attempts: The number of attempts at sampling a compliant formula.
+      sampling: The sampling function used.
+      end_time: The `world_time` value at which each stream should end.
+      task_name: The name of the task to load task functions for.
+
+  Returns:
+      A list with the list of states of each stream, in the order of seeds.
+  """
+  if not isinstance(operators, types.MappingProxyType):
+    operators = freeze_operators(operators, task_name)
+
+  streams = []
+  for seed in seeds:
+    # Formulas draw from the global generators, e.g. via randint, so the
+    # streams run one after the other
+    random.seed(seed)
+    np.random.seed(seed)
+    streams.append(
+        generate_simulation_stream(
+            initial_state,
+            operators,
+            first_operator,
+            max_attempts,
+            sampling,
+            end_time,
+            task_name,
+        )
+    )
+  return streams
+
+
 def preprocess_systems_definitions(systems_definitions):
   """Preprocess systems_definitions to ensure it has the required structure.
 
@@ -418,10 +939,15 @@ def preprocess_systems_definitions(systems_definitions):
   return processed_systems_definitions
 
 
+_CALLABLE_EXPRESSION = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*\s*\(.*\)$')
+
+
 def is_callable_expression(value):
   """Check if a string looks like a callable expression."""
-  return isinstance(value, str) and re.match(
-      r'^[a-zA-Z_][a-zA-Z0-9_]*\s*\(.*\)$', value.strip()
+  return (
+      isinstance(value, str)
+      and '(' in value
+      and _CALLABLE_EXPRESSION.match(value.strip()) is not None
   )
 
 
@@ -460,8 +986,18 @@ def generate_operators(
             print(f'Error evaluating {full_component_name}: {str(e)}')
             components[full_component_name] = initial_value
         else:
-          # If it's not a callable expression, use the value as is
-          components[full_component_name] = initial_value
+          if component_name.endswith('prompt') and isinstance(
+              initial_value, str
+          ):
+            # Prompts are written as indented triple-quoted strings, whose
+            # indentation would otherwise be sent to the LM on every call.
+            initial_value = textwrap.dedent(initial_value).strip()
+          # If it's not a callable expression, use the value as is, with
+          # short strings such as the ball states interned so that the
+          # dictionary lookups and comparisons on them succeed by identity.
+          components[full_component_name] = _intern_strings(
+              initial_value, max_length=64
+          )
 
   # Update state with components
   state.update(components)
@@ -534,4 +1070,8 @@ def generate_operators(
       'sample_mode': 'full',
       'all': True,
   })
+  # 'deterministic' runs every formula without the LM. A config sets it with
+  # 'defaults': {'lm_mode': 'deterministic'} in its variables, which the
+  # operators also copy into the state at every step.
+  state.setdefault('lm_mode', default_values.get('lm_mode', 'lm'))
   return all_systems, state
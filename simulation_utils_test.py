@@ -0,0 +1,265 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for simulation_utils."""
+
+import ast
+import contextlib
+import io
+import pathlib
+import random
+import unittest
+
+from all_task_functions import maze_functions
+from simulation_streams import simulation_utils
+
+
+def _load_config(name, index=0):
+  """Loads a file in configs/ as the editor does, for the given index."""
+  path = pathlib.Path(__file__).parent / 'configs' / name
+  content = path.read_text().replace('{index}', str(index))
+  ecs = ast.literal_eval(content[content.find('ecs_config = {') + 13:])
+  for entity, components in ecs['entities'].items():
+    for component in components:
+      for i, operator in enumerate(ecs['systems_definitions'][component]):
+        operator.setdefault('id', f'operator_{i + 1}_{entity}_{component}')
+  return ecs
+
+
+class GenerateSimulationStreamsTest(unittest.TestCase):
+
+  def _run(self, ecs, first_operator, task_name):
+    """Rolls out two deterministic streams, discarding the printed logs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+      operators, initial_state = simulation_utils.generate_operators(
+          ecs['entities'],
+          ecs['variables'],
+          ecs['systems_definitions'],
+          task_name=task_name,
+      )
+      initial_state['prompt'] = ''
+      initial_state['lm_mode'] = 'deterministic'
+      return simulation_utils.generate_simulation_streams(
+          initial_state,
+          operators,
+          first_operator,
+          seeds=[0, 1],
+          end_time=3,
+          task_name=task_name,
+      )
+
+  def test_maze_config(self):
+    ecs = _load_config('maze.py')
+    first_entity = next(iter(ecs['entities']))
+    first_component = ecs['entities'][first_entity][0]
+    first_operator = ecs['systems_definitions'][first_component][0]['id']
+    streams = self._run(ecs, first_operator, 'maze')
+    self.assertEqual(len(streams), 2)
+    for stream in streams:
+      self.assertEqual(stream[-1]['state']['world_time'], 3)
+      observation = stream[-1]['state']['current_observation']
+      self.assertTrue(observation.startswith('Observations: '), observation)
+
+  def test_formulas_run_with_task_functions(self):
+    # get_maze_goal_position_x is a maze task function, which is not
+    # compiled to native code, so the formula is evaluated by run_formula
+    ecs = {
+        'entities': {'world': ['clock'], 'mouse': ['goal']},
+        'variables': {'clock': {'time': 0}, 'goal': {'x': -1}},
+        'systems_definitions': {
+            'clock': [{
+                'id': 'operator_1_world_clock',
+                'formula': 'world_time = world_time + 1',
+            }],
+            'goal': [{
+                'id': 'operator_1_mouse_goal',
+                'formula': 'mouse_x = get_maze_goal_position_x(0)',
+            }],
+        },
+    }
+    streams = self._run(ecs, 'operator_1_world_clock', 'maze')
+    for stream in streams:
+      self.assertEqual(
+          stream[-1]['state']['mouse_x'],
+          maze_functions.get_maze_goal_position_x(0),
+      )
+
+
+class HistoryTest(unittest.TestCase):
+
+  def test_query_matches_the_list_query_after_appends(self):
+    queries = (
+        {'visibility': 'plan'},
+        {'visibility': ['plan', 'public']},
+        {'alice': True, 'visibility': ['public']},
+        {'value': [1, 2]},
+        {'value': [[1], 2]},
+    )
+    rng = random.Random(0)
+    history = simulation_utils.History()
+    for i in range(60):
+      history.append({
+          'state': {
+              'visibility': rng.choice(['plan', 'public', 'hidden', None]),
+              'alice': rng.choice([True, False, 1]),
+              'value': rng.choice([1, 2, [1], None]),
+          },
+          'output': [f'step {i}'],
+      })
+      if i % 7 == 0:
+        for query in queries:
+          self.assertEqual(
+              simulation_utils.query_history(history, **query),
+              simulation_utils.query_history(list(history), **query),
+              (i, query),
+          )
+
+
+class LmModeTest(unittest.TestCase):
+
+  def _sampled_calls(self, variables):
+    """Runs a stream with an always-sampled operator, returning the calls."""
+    calls = []
+
+    def sampling(prompt, context, default_assignment, value, mode='full'):
+      calls.append((prompt, context, default_assignment, mode))
+      return f'{default_assignment} = {value!r}'
+
+    systems_definitions = {
+        'clock': [{'formula': 'world_time = world_time + 1'}],
+        'choice': [{'formula': 'agent_action = agent_action', 'use_lm': True}],
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+      operators, initial_state = simulation_utils.generate_operators(
+          {'world': ['clock'], 'agent': ['choice']},
+          variables,
+          systems_definitions,
+          default_values=variables.get('defaults', {}),
+      )
+      stream = simulation_utils.generate_simulation_stream(
+          initial_state,
+          operators,
+          'operator_1_world_clock',
+          sampling=sampling,
+          end_time=3,
+      )
+    self.assertEqual(stream[-1]['state']['agent_action'], 'wait')
+    return initial_state['lm_mode'], calls
+
+  def test_lm_by_default(self):
+    lm_mode, calls = self._sampled_calls(
+        {'clock': {'time': 0}, 'choice': {'action': 'wait'}}
+    )
+    self.assertEqual(lm_mode, 'lm')
+    self.assertEqual(len(calls), 2)
+
+  def test_deterministic_from_config_defaults(self):
+    lm_mode, calls = self._sampled_calls({
+        'clock': {'time': 0},
+        'choice': {'action': 'wait'},
+        'defaults': {'lm_mode': 'deterministic'},
+    })
+    self.assertEqual(lm_mode, 'deterministic')
+    self.assertEqual(calls, [])
+
+  def test_use_lm_is_decided_once_per_step(self):
+    decisions = []
+
+    def use_lm(state):
+      del state  # Unused
+      decisions.append(len(decisions) % 2 == 0)
+      return decisions[-1]
+
+    calls = []
+
+    def sampling(prompt, context, default_assignment, value, mode='full'):
+      del prompt, context, mode  # Unused
+      calls.append(default_assignment)
+      return f'{default_assignment} = {value!r}'
+
+    systems_definitions = {
+        'clock': [{'formula': 'world_time = world_time + 1'}],
+        'choice': [{'formula': 'agent_action = agent_action'}],
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+      operators, initial_state = simulation_utils.generate_operators(
+          {'world': ['clock'], 'agent': ['choice']},
+          {'clock': {'time': 0}, 'choice': {'action': 'wait'}},
+          systems_definitions,
+      )
+      for operator in operators:
+        if operator['id'] == 'operator_1_agent_choice':
+          operator['use_lm'] = use_lm
+      simulation_utils.generate_simulation_stream(
+          initial_state,
+          operators,
+          'operator_1_world_clock',
+          sampling=sampling,
+          end_time=5,
+      )
+    # The choice runs at times 1 to 4 and samples when the decision is True
+    self.assertEqual(decisions, [True, False, True, False])
+    self.assertEqual(len(calls), 2)
+
+
+class SampleKeyTest(unittest.TestCase):
+
+  def test_reuses_the_sample_for_the_same_key(self):
+    calls = []
+
+    def sampling(prompt, context, default_assignment, value, mode='full'):
+      del prompt, context, value, mode  # Unused
+      calls.append(default_assignment)
+      return f"{default_assignment} = 'act{len(calls)}'"
+
+    systems_definitions = {
+        'clock': [{'formula': 'world_time = world_time + 1'}],
+        'contribution': [{'formula': 'agent_contribution = world_time // 3'}],
+        'choice': [{
+            'formula': 'agent_action = agent_action',
+            'use_lm': True,
+            'sample_key': 'agent_contribution',
+        }],
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+      operators, initial_state = simulation_utils.generate_operators(
+          {'world': ['clock'], 'agent': ['contribution', 'choice']},
+          {
+              'clock': {'time': 0},
+              'contribution': {'contribution': 0},
+              'choice': {'action': 'wait'},
+          },
+          systems_definitions,
+      )
+      stream = simulation_utils.generate_simulation_stream(
+          initial_state,
+          operators,
+          'operator_1_world_clock',
+          sampling=sampling,
+          end_time=7,
+      )
+    actions = [
+        step['state']['agent_action']
+        for step in stream
+        if step['operator_id'] == 'operator_1_agent_choice'
+    ]
+    # The contributions are 0, 0, 1, 1, 1 and 2 at times 1 to 6
+    self.assertEqual(
+        actions, ['act1', 'act1', 'act2', 'act2', 'act2', 'act3']
+    )
+    self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+  unittest.main()